@@ -0,0 +1,185 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework import status
+from rest_framework.response import Response
+
+from book.models import Book
+from library_service.routers import replica_reads
+
+
+CATALOG_VERSION_KEY = "book:catalog:version"
+CATALOG_MODIFIED_KEY = "book:catalog:modified"
+BOOK_STAMP_KEY = "book:stamp:{}"
+CACHE_HITS_KEY = "book:cache:hits"
+CACHE_MISSES_KEY = "book:cache:misses"
+
+
+def _incr(key):
+    try:
+        return cache.incr(key)
+    except ValueError:
+        cache.add(key, 0, timeout=None)
+        return cache.incr(key)
+
+
+def get_catalog_version():
+    """Current catalog version, part of every cached book response key"""
+    version = cache.get(CATALOG_VERSION_KEY)
+    if version is None:
+        # Start from a timestamp, so a version lost to eviction can never
+        # come back and resurrect responses cached under it.
+        cache.add(CATALOG_VERSION_KEY, time.time_ns(), timeout=None)
+        version = cache.get(CATALOG_VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    """
+    Invalidate every cached book response.
+
+    The version is bumped right away and once more after the surrounding
+    transaction commits, so a response cached from pre-commit data in
+    between is not served either.
+    """
+
+    def bump():
+        get_catalog_version()
+        _incr(CATALOG_VERSION_KEY)
+        cache.set(CATALOG_MODIFIED_KEY, time.time(), timeout=None)
+
+    bump()
+    transaction.on_commit(bump)
+
+
+def set_book_stamp(book_id, updated_at):
+    """Remember when a book last changed, as stored in `updated_at`"""
+    key = BOOK_STAMP_KEY.format(book_id)
+    stamp = updated_at.timestamp()
+    cache.set(key, stamp, timeout=None)
+    transaction.on_commit(lambda: cache.set(key, stamp, timeout=None))
+
+
+def delete_book_stamp(book_id):
+    cache.delete(BOOK_STAMP_KEY.format(book_id))
+
+
+def get_book_stamp(book_id):
+    """Last change of a book as a POSIX timestamp, None for unknown books"""
+    try:
+        book_id = int(book_id)
+    except (TypeError, ValueError):
+        return None
+
+    key = BOOK_STAMP_KEY.format(book_id)
+    stamp = cache.get(key)
+    if stamp is None:
+        updated_at = (
+            Book.objects.filter(pk=book_id)
+            .values_list("updated_at", flat=True)
+            .first()
+        )
+        if updated_at is None:
+            return None
+        stamp = updated_at.timestamp()
+        cache.set(key, stamp, timeout=None)
+    return stamp
+
+
+def _etag(*parts):
+    raw = ":".join(str(part) for part in parts)
+    return f'"{hashlib.md5(raw.encode()).hexdigest()}"'
+
+
+def list_validators(request):
+    """ETag and Last-Modified of a book list, derived from the catalog version"""
+    etag = _etag(response_cache_key(request), request.accepted_renderer.format)
+    return etag, cache.get(CATALOG_MODIFIED_KEY)
+
+
+def detail_validators(request, book_id):
+    """
+    ETag and Last-Modified of a single book, derived from its stamp and
+    the params choosing its fields
+    """
+    stamp = get_book_stamp(book_id)
+    if stamp is None:
+        return None, None
+    etag = _etag(
+        book_id, stamp, normalized_params(request),
+        request.accepted_renderer.format,
+    )
+    return etag, stamp
+
+
+def conditional_response(request, etag, last_modified, build_response):
+    """
+    Answer 304 Not Modified when the client validators still match,
+    otherwise build the response and attach ETag/Last-Modified to it.
+    """
+    if etag is None:
+        return build_response()
+
+    last_modified = last_modified and int(last_modified)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        response = build_response()
+        if response.status_code != status.HTTP_200_OK:
+            return response
+
+    response["ETag"] = etag
+    if last_modified:
+        response["Last-Modified"] = http_date(last_modified)
+    return response
+
+
+def normalized_params(request):
+    """Sorted non-empty query params, without the default page"""
+    return sorted(
+        (key, value)
+        for key, values in request.query_params.lists()
+        for value in values
+        if value and not (key == "page" and value == "1")
+    )
+
+
+def response_cache_key(request):
+    """Key a book response on catalog version, path and normalized params"""
+    raw = f"{request.get_host()}{request.path}?{normalized_params(request)}"
+    digest = hashlib.md5(raw.encode()).hexdigest()
+    return f"book:response:{get_catalog_version()}:{digest}"
+
+
+def cached_response(request, build_response):
+    """
+    Serve response data from the cache, building and storing it on a
+    miss. Misses are built from the primary, a lagging replica would
+    store stale data under the current catalog version.
+    """
+    key = response_cache_key(request)
+    data = cache.get(key)
+    if data is not None:
+        _incr(CACHE_HITS_KEY)
+        return Response(data)
+
+    _incr(CACHE_MISSES_KEY)
+    with replica_reads(enabled=False):
+        response = build_response()
+    if response.status_code == status.HTTP_200_OK:
+        cache.set(key, response.data, settings.BOOK_CACHE_TIMEOUT)
+    return response
+
+
+def cache_stats():
+    return {
+        "hits": cache.get(CACHE_HITS_KEY, 0),
+        "misses": cache.get(CACHE_MISSES_KEY, 0),
+        "catalog_version": get_catalog_version(),
+    }
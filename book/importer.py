@@ -0,0 +1,186 @@
+import csv
+import io
+import json
+import time
+
+from django.conf import settings
+from django.core.management.color import no_style
+from django.db import DatabaseError, connection, transaction
+from django.utils import timezone
+from rest_framework import serializers
+
+from book.cache import bump_catalog_version
+from book.inventory import books_changed
+from book.models import Book
+from book.serializers import BookSerializer
+
+
+IMPORT_FORMATS = ("csv", "jsonl")
+COPY_COLUMNS = (
+    "title", "author", "cover", "inventory", "daily_fee", "updated_at"
+)
+
+
+def guess_import_format(filename):
+    return "jsonl" if filename.endswith((".jsonl", ".ndjson")) else "csv"
+
+
+def iter_records(stream, import_format):
+    """
+    (line, row, errors) of each record of a binary CSV or JSON Lines
+    stream, `errors` being set for records that are not a row at all
+    """
+    if import_format == "csv":
+        text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row, None
+        return
+
+    for line, raw in enumerate(stream, start=1):
+        if not raw.strip():
+            continue
+        try:
+            row = json.loads(raw)
+        except ValueError as exc:
+            yield line, None, {"non_field_errors": [f"Invalid JSON: {exc}"]}
+            continue
+        if not isinstance(row, dict):
+            yield line, None, {"non_field_errors": ["Expected a JSON object"]}
+            continue
+        yield line, row, None
+
+
+class BookImport:
+    """
+    Validate book rows with BookSerializer and write them in batches.
+
+    Rows with an `id` upsert that book, the others are inserted, through
+    COPY on PostgreSQL. Invalid rows, and the rows of a batch the
+    database rejects, are reported by line without stopping the import.
+    """
+
+    def __init__(self, batch_size=None, use_copy=True, max_errors=None):
+        self.batch_size = batch_size or settings.BOOK_IMPORT_BATCH_SIZE
+        self.use_copy = use_copy and connection.vendor == "postgresql"
+        self.max_errors = max_errors or settings.BOOK_IMPORT_MAX_ERRORS
+        self.serializer = BookSerializer()
+        self.rows = self.created = self.updated = self.failed = 0
+        self.errors = []
+        self.new_ids = False
+
+    def error(self, line, errors):
+        self.failed += 1
+        if len(self.errors) < self.max_errors:
+            self.errors.append({"line": line, "errors": errors})
+
+    def validate(self, row):
+        book_id = row.get("id")
+        data = self.serializer.run_validation(row)
+        if book_id not in (None, ""):
+            try:
+                data["id"] = int(book_id)
+            except (TypeError, ValueError):
+                raise serializers.ValidationError(
+                    {"id": ["A valid integer is required."]}
+                )
+        return data
+
+    def copy(self, batch):
+        now = timezone.now()
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for data in batch:
+            writer.writerow(
+                [*(data[column] for column in COPY_COLUMNS[:-1]), now]
+            )
+        buffer.seek(0)
+        columns = ", ".join(COPY_COLUMNS)
+        with connection.cursor() as cursor:
+            cursor.copy_expert(
+                f"COPY {Book._meta.db_table} ({columns}) "
+                f"FROM STDIN WITH (FORMAT csv)",
+                buffer,
+            )
+
+    def write(self, batch):
+        inserts = [data for data in batch if "id" not in data]
+        upserts = [data for data in batch if "id" in data]
+
+        with transaction.atomic():
+            if inserts and self.use_copy:
+                self.copy(inserts)
+            elif inserts:
+                Book.objects.bulk_create(
+                    [Book(**data) for data in inserts],
+                    batch_size=self.batch_size,
+                )
+
+            existing = set()
+            if upserts:
+                ids = [data["id"] for data in upserts]
+                existing = set(
+                    Book.objects.filter(id__in=ids).values_list(
+                        "id", flat=True
+                    )
+                )
+                books = Book.objects.bulk_create(
+                    [Book(**data) for data in upserts],
+                    batch_size=self.batch_size,
+                    update_conflicts=True,
+                    unique_fields=["id"],
+                    update_fields=COPY_COLUMNS,
+                )
+                books_changed(ids, books[0].updated_at)
+
+        self.new_ids = self.new_ids or len(upserts) > len(existing)
+        self.created += len(batch) - len(existing)
+        self.updated += len(existing)
+
+    def flush(self, batch):
+        if not batch:
+            return
+        try:
+            self.write([data for _, data in batch])
+        except DatabaseError as exc:
+            for line, _ in batch:
+                self.error(line, {"non_field_errors": [str(exc)]})
+
+    def run(self, stream, import_format):
+        started = time.perf_counter()
+        batch = []
+        for line, row, errors in iter_records(stream, import_format):
+            self.rows += 1
+            if errors is not None:
+                self.error(line, errors)
+                continue
+            try:
+                batch.append((line, self.validate(row)))
+            except serializers.ValidationError as exc:
+                self.error(line, exc.detail)
+                continue
+            if len(batch) >= self.batch_size:
+                self.flush(batch)
+                batch = []
+        self.flush(batch)
+
+        if self.new_ids:
+            # Inserted ids do not advance the sequence on PostgreSQL
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), [Book]
+                ):
+                    cursor.execute(sql)
+        if self.created or self.updated:
+            bump_catalog_version()
+
+        elapsed = time.perf_counter() - started
+        return {
+            "rows": self.rows,
+            "created": self.created,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+            "elapsed": round(elapsed, 3),
+            "rows_per_second": round(self.rows / max(elapsed, 1e-6)),
+        }
@@ -0,0 +1,84 @@
+from django.db.models import Case, F, IntegerField, Q, Value, When
+from django.utils import timezone
+
+from book.cache import bump_catalog_version, set_book_stamp
+from book.models import Book
+
+
+def take_book(book_id):
+    """
+    Take one copy of a book with a single conditional UPDATE.
+
+    Returns False when no copy is left (or the book does not exist).
+    Concurrent callers can never drive the inventory below zero.
+    """
+    updated_at = timezone.now()
+    taken = Book.objects.filter(id=book_id, inventory__gt=0).update(
+        inventory=F("inventory") - 1, updated_at=updated_at
+    )
+    if taken:
+        book_changed(book_id, updated_at)
+    return bool(taken)
+
+
+def return_book(book_id):
+    """Put one copy of a book back with a single UPDATE"""
+    updated_at = timezone.now()
+    returned = Book.objects.filter(id=book_id).update(
+        inventory=F("inventory") + 1, updated_at=updated_at
+    )
+    if returned:
+        book_changed(book_id, updated_at)
+    return bool(returned)
+
+
+def _per_book(counts):
+    return Case(
+        *[
+            When(id=book_id, then=Value(count))
+            for book_id, count in counts.items()
+        ],
+        output_field=IntegerField(),
+    )
+
+
+def take_books(counts):
+    """
+    Take `counts[book_id]` copies of several books with one UPDATE.
+
+    Returns False when any of the books lacks copies; the books that did
+    have enough are updated all the same, so call it inside the
+    transaction that is rolled back in that case.
+    """
+    updated_at = timezone.now()
+    enough = Q()
+    for book_id, count in counts.items():
+        enough |= Q(id=book_id, inventory__gte=count)
+    taken = Book.objects.filter(enough).update(
+        inventory=F("inventory") - _per_book(counts), updated_at=updated_at
+    )
+    if taken != len(counts):
+        return False
+    books_changed(counts, updated_at)
+    return True
+
+
+def return_books(counts):
+    """Put `counts[book_id]` copies of several books back with one UPDATE"""
+    updated_at = timezone.now()
+    returned = Book.objects.filter(id__in=counts).update(
+        inventory=F("inventory") + _per_book(counts), updated_at=updated_at
+    )
+    books_changed(counts, updated_at)
+    return returned
+
+
+def book_changed(book_id, updated_at):
+    """Queryset updates skip the model signals, invalidate by hand"""
+    books_changed([book_id], updated_at)
+
+
+def books_changed(book_ids, updated_at):
+    for book_id in book_ids:
+        set_book_stamp(book_id, updated_at)
+    bump_catalog_version()
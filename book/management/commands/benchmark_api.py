@@ -0,0 +1,345 @@
+import json
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from unittest import mock
+
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.test import APIClient
+from rest_framework.views import APIView
+
+from book.cache import bump_catalog_version
+from book.models import Book
+from borrowing.models import Borrowing, OutboxMessage
+from borrowing.overdue import QueryCounter
+from borrowing.tasks import overdue_borrowings
+from library_service import notification
+
+
+BOOK_URL = reverse("book:book-list")
+BORROWING_URL = reverse("borrowing:borrowing-list")
+BENCHMARK_STAFF_EMAIL = "benchmark-staff@library.example"
+
+
+class Scenario:
+    """
+    One benchmarked operation: a request through the URL routes, or a
+    plain call for `call`. `prepare` runs untimed before each repeat and
+    returns the request data, if any.
+    """
+
+    def __init__(
+        self, name, path=None, method="get", params=None, user="reader",
+        prepare=None, call=None, status=200,
+    ):
+        self.name = name
+        self.path = path
+        self.method = method
+        self.params = params or {}
+        self.user = user
+        self.prepare = prepare
+        self.call = call
+        self.status = status
+
+
+class Command(BaseCommand):
+    """
+    Django command to benchmark the API through its URL routes against
+    a seeded database (see seed_library), reporting p50/p95/p99
+    latency, throughput and SQL queries per scenario.
+
+    Results can be saved as a baseline JSON file and later runs are
+    compared with it, failing on latency or query count regressions.
+    Checkouts and returns commit like in production, on-commit cache
+    invalidation included; the borrowings, outbox messages and staff
+    user they add are deleted and the inventory they changed restored
+    afterwards. Throttling is disabled and notifications are kept in
+    memory instead of sent.
+    """
+
+    help = "Benchmark the API scenarios and compare them with a baseline"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=50)
+        parser.add_argument("--warmup", type=int, default=3)
+        parser.add_argument(
+            "-k", dest="match", help="Only run scenarios containing this"
+        )
+        parser.add_argument(
+            "--baseline", default="benchmark_api_baseline.json",
+            help="Baseline file to compare with, if it exists",
+        )
+        parser.add_argument(
+            "--save-baseline", action="store_true",
+            help="Write the results to the baseline file",
+        )
+        parser.add_argument(
+            "--tolerance", type=float, default=0.25,
+            help="Allowed p95 slowdown over the baseline, 0.25 is 25%%",
+        )
+
+    def users(self):
+        latest = Borrowing.objects.order_by("-id").first()
+        if latest is None or not Book.objects.exists():
+            raise CommandError("No books or borrowings, run seed_library")
+        reader = get_user_model().objects.filter(id=latest.user_id).first()
+        if reader is None:
+            raise CommandError("The latest borrowing has no user")
+        staff = get_user_model().objects.filter(is_staff=True).first()
+        if staff is None:
+            staff = get_user_model().objects.create_user(
+                BENCHMARK_STAFF_EMAIL, is_staff=True
+            )
+        return {"reader": reader, "staff": staff}
+
+    def scenarios(self, users):
+        reader = users["reader"]
+        book = Book.objects.order_by("-inventory", "id").first()
+        ids = ",".join(
+            str(book_id) for book_id in
+            Book.objects.values_list("id", flat=True)[:20]
+        )
+        expected_return_date = date.today() + timedelta(days=7)
+
+        def active_borrowing():
+            borrowing = Borrowing.objects.create(
+                book_id=book.id,
+                user_id=reader.id,
+                expected_return_date=expected_return_date,
+            )
+            return {
+                "path": reverse(
+                    "borrowing:borrowing-detail", args=[borrowing.id]
+                ),
+                "data": {
+                    "expected_return_date": expected_return_date,
+                    "actual_return_date": date.today(),
+                },
+            }
+
+        def restock():
+            Book.objects.filter(id=book.id).update(inventory=1000)
+            return {}
+
+        def cold(params):
+            def prepare():
+                bump_catalog_version()
+                return {}
+            return {"params": params, "prepare": prepare}
+
+        return [
+            Scenario("book list", BOOK_URL),
+            Scenario("book list, cold cache", BOOK_URL, **cold({})),
+            Scenario(
+                "book list, page_size=100", BOOK_URL,
+                **cold({"page_size": 100}),
+            ),
+            Scenario(
+                "book list, ?title=", BOOK_URL,
+                **cold({"title": book.title.split()[0]}),
+            ),
+            Scenario(
+                "book list, ?author=", BOOK_URL,
+                **cold({"author": book.author.split()[-1]}),
+            ),
+            Scenario(
+                "book list, ?cover=", BOOK_URL, **cold({"cover": "hard"})
+            ),
+            Scenario("book list, ?ids=", BOOK_URL, **cold({"ids": ids})),
+            Scenario(
+                "book list, cursor", BOOK_URL,
+                **cold({"pagination": "cursor"}),
+            ),
+            Scenario(
+                "book retrieve",
+                reverse("book:book-detail", args=[book.id]),
+                **cold({}),
+            ),
+            Scenario("borrowing list, reader", BORROWING_URL),
+            Scenario("borrowing list, staff", BORROWING_URL, user="staff"),
+            Scenario(
+                "borrowing list, staff ?user_id=", BORROWING_URL,
+                params={"user_id": reader.id}, user="staff",
+            ),
+            Scenario(
+                "borrowing list, staff ?is_active=", BORROWING_URL,
+                params={"is_active": "true"}, user="staff",
+            ),
+            Scenario(
+                "borrowing list, page_size=100 expand", BORROWING_URL,
+                params={"page_size": 100, "expand": "book"}, user="staff",
+            ),
+            Scenario(
+                "borrowing checkout", BORROWING_URL, method="post",
+                params={
+                    "book_id": book.id,
+                    "expected_return_date": expected_return_date,
+                },
+                prepare=restock,
+                status=201,
+            ),
+            Scenario(
+                "borrowing return", method="put", prepare=active_borrowing
+            ),
+            Scenario(
+                "overdue_borrowings task",
+                prepare=lambda: notification.outbox.clear() or {},
+                call=lambda: overdue_borrowings(
+                    fan_out=False, incremental=False
+                ),
+            ),
+        ]
+
+    def snapshot(self, users):
+        """What the run adds or changes, to undo it afterwards"""
+        return {
+            "borrowing_id": (
+                Borrowing.objects.order_by("-id")
+                .values_list("id", flat=True).first() or 0
+            ),
+            "outbox_id": (
+                OutboxMessage.objects.order_by("-id")
+                .values_list("id", flat=True).first() or 0
+            ),
+            "inventory": dict(Book.objects.values_list("id", "inventory")),
+            "staff_created": users["staff"].email == BENCHMARK_STAFF_EMAIL,
+        }
+
+    def cleanup(self, snapshot, users):
+        Borrowing.objects.filter(id__gt=snapshot["borrowing_id"]).delete()
+        OutboxMessage.objects.filter(id__gt=snapshot["outbox_id"]).delete()
+        inventory = snapshot["inventory"]
+        for book_id, count in Book.objects.values_list("id", "inventory"):
+            if inventory.get(book_id, count) != count:
+                Book.objects.filter(id=book_id).update(
+                    inventory=inventory[book_id]
+                )
+        bump_catalog_version()
+        if snapshot["staff_created"]:
+            users["staff"].delete()
+
+    def run_once(self, scenario, clients):
+        request = scenario.prepare() if scenario.prepare else {}
+        with QueryCounter() as queries:
+            started = time.perf_counter()
+            if scenario.call:
+                scenario.call()
+                status = scenario.status
+            else:
+                response = getattr(clients[scenario.user], scenario.method)(
+                    request.get("path", scenario.path),
+                    request.get("data", scenario.params),
+                    **({"format": "json"} if scenario.method != "get" else {}),
+                )
+                status = response.status_code
+            elapsed = time.perf_counter() - started
+        if status != scenario.status:
+            raise CommandError(
+                f"{scenario.name}: status {status}, "
+                f"expected {scenario.status}"
+            )
+        return elapsed, queries.count
+
+    def measure(self, scenario, clients, repeat, warmup):
+        for _ in range(warmup):
+            self.run_once(scenario, clients)
+        timings, queries = [], []
+        for _ in range(repeat):
+            elapsed, count = self.run_once(scenario, clients)
+            timings.append(elapsed * 1000)
+            queries.append(count)
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "p50": round(percentiles[49], 3),
+            "p95": round(percentiles[94], 3),
+            "p99": round(percentiles[98], 3),
+            "rps": round(len(timings) / (sum(timings) / 1000), 1),
+            "queries": max(queries),
+        }
+
+    def regressions(self, result, baseline, tolerance):
+        flags = []
+        if result["p95"] > baseline["p95"] * (1 + tolerance):
+            flags.append(f"p95 {result['p95'] / baseline['p95'] - 1:+.0%}")
+        if result["queries"] > baseline["queries"]:
+            flags.append(
+                f"queries {baseline['queries']} -> {result['queries']}"
+            )
+        return flags
+
+    def handle(self, *args, **options):
+        repeat = max(options["repeat"], 2)
+        baseline = {}
+        if os.path.exists(options["baseline"]):
+            with open(options["baseline"]) as baseline_file:
+                baseline = json.load(baseline_file)
+
+        results, failures = {}, []
+        self.stdout.write(
+            f"{'scenario':<40}{'p50':>9}{'p95':>9}{'p99':>9}"
+            f"{'req/s':>9}{'queries':>9}"
+        )
+        with (
+            override_settings(
+                ALLOWED_HOSTS=["*"],
+                NOTIFICATION_BACKEND=(
+                    "library_service.notification.LocmemBackend"
+                ),
+            ),
+            mock.patch.object(APIView, "get_throttles", return_value=[]),
+        ):
+            users = self.users()
+            snapshot = self.snapshot(users)
+            clients = {}
+            for role, user in users.items():
+                clients[role] = APIClient()
+                clients[role].force_authenticate(user)
+
+            match = options["match"]
+            try:
+                for scenario in self.scenarios(users):
+                    if match and match not in scenario.name:
+                        continue
+                    result = self.measure(
+                        scenario, clients, repeat, options["warmup"]
+                    )
+                    results[scenario.name] = result
+                    flags = []
+                    if scenario.name in baseline:
+                        flags = self.regressions(
+                            result, baseline[scenario.name],
+                            options["tolerance"],
+                        )
+                    if flags:
+                        failures.append(scenario.name)
+                    line = (
+                        f"{scenario.name:<40}{result['p50']:>9.2f}"
+                        f"{result['p95']:>9.2f}{result['p99']:>9.2f}"
+                        f"{result['rps']:>9.1f}{result['queries']:>9}"
+                    )
+                    if flags:
+                        line += self.style.ERROR(
+                            f"  REGRESSION {', '.join(flags)}"
+                        )
+                    self.stdout.write(line)
+            finally:
+                self.cleanup(snapshot, users)
+
+        self.stdout.write(
+            f"Latency in ms, database: {connection.vendor}, "
+            f"repeat: {repeat}"
+        )
+        if options["save_baseline"]:
+            with open(options["baseline"], "w") as baseline_file:
+                json.dump({**baseline, **results}, baseline_file, indent=2)
+            self.stdout.write(f"Baseline saved to {options['baseline']}")
+        elif failures:
+            raise CommandError(
+                f"Regressions over {options['baseline']}: "
+                f"{', '.join(failures)}"
+            )
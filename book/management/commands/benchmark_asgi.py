@@ -0,0 +1,244 @@
+import asyncio
+import io
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from unittest import mock
+from urllib.parse import urlencode
+
+from django.contrib.auth import get_user_model
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from django.test import override_settings
+from django.urls import reverse
+from rest_framework.views import APIView
+from rest_framework_simplejwt.tokens import AccessToken
+
+from book.models import Book
+from borrowing.models import Borrowing
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the async read endpoints served by the
+    ASGI handler with their DRF counterparts served by the WSGI handler,
+    `--concurrency` requests in flight at once: as many asyncio tasks on
+    one event loop for ASGI, as many threads for WSGI, like a threaded
+    WSGI server. Both handlers run in process with all the middleware.
+
+    Reads the database as seeded by seed_library and changes nothing.
+    Throttling is disabled and the WSGI book responses are not cached
+    unless --cache is given, so both paths do the same queries.
+    """
+
+    help = "Benchmark the async endpoints under ASGI against WSGI"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--requests", type=int, default=500)
+        parser.add_argument(
+            "--concurrency", type=int, nargs="+", default=[1, 16, 64]
+        )
+        parser.add_argument(
+            "-k", dest="match", help="Only run scenarios containing this"
+        )
+        parser.add_argument(
+            "--cache", action="store_true",
+            help="Keep the book response cache of the WSGI endpoints",
+        )
+
+    def scenarios(self):
+        latest = Borrowing.objects.order_by("-id").first()
+        book = Book.objects.order_by("id").first()
+        if latest is None or book is None:
+            raise CommandError("No books or borrowings, run seed_library")
+        reader = get_user_model().objects.filter(id=latest.user_id).first()
+        if reader is None:
+            raise CommandError("The latest borrowing has no user")
+        reader = f"Bearer {AccessToken.for_user(reader)}"
+
+        book_list = (
+            reverse("book:book-list"), reverse("book:book-list-async")
+        )
+        borrowing_list = (
+            reverse("borrowing:borrowing-list"),
+            reverse("borrowing:borrowing-list-async"),
+        )
+        scenarios = [
+            ("book list", *book_list, {}, reader),
+            ("book list, page_size=100", *book_list, {"page_size": 100},
+             reader),
+            ("book list, ?title=", *book_list,
+             {"title": book.title.split()[0]}, reader),
+            ("book list, cursor", *book_list, {"pagination": "cursor"},
+             reader),
+            (
+                "book retrieve",
+                reverse("book:book-detail", args=[book.id]),
+                reverse("book:book-detail-async", args=[book.id]),
+                {},
+                reader,
+            ),
+            ("borrowing list, reader", *borrowing_list, {}, reader),
+            ("borrowing list, reader expand", *borrowing_list,
+             {"expand": "book"}, reader),
+        ]
+        staff = get_user_model().objects.filter(is_staff=True).first()
+        if staff is not None:
+            staff = f"Bearer {AccessToken.for_user(staff)}"
+            scenarios.append(
+                ("borrowing list, staff page_size=100", *borrowing_list,
+                 {"page_size": 100}, staff)
+            )
+        return scenarios
+
+    async def asgi_get(self, app, path, query, authorization):
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [
+                (b"host", b"testserver"),
+                (b"authorization", authorization.encode()),
+            ],
+            "client": ("127.0.0.1", 50000),
+            "server": ("testserver", 80),
+        }
+        status = None
+
+        async def receive():
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        started = time.perf_counter()
+        await app(scope, receive, send)
+        return time.perf_counter() - started, status
+
+    def wsgi_get(self, app, path, query, authorization):
+        environ = {
+            "REQUEST_METHOD": "GET",
+            "SCRIPT_NAME": "",
+            "PATH_INFO": path,
+            "QUERY_STRING": query,
+            "SERVER_NAME": "testserver",
+            "SERVER_PORT": "80",
+            "SERVER_PROTOCOL": "HTTP/1.1",
+            "HTTP_HOST": "testserver",
+            "HTTP_AUTHORIZATION": authorization,
+            "REMOTE_ADDR": "127.0.0.1",
+            "wsgi.input": io.BytesIO(),
+            "wsgi.errors": sys.stderr,
+            "wsgi.url_scheme": "http",
+        }
+        status = None
+
+        def start_response(status_line, headers, exc_info=None):
+            nonlocal status
+            status = int(status_line.split()[0])
+
+        started = time.perf_counter()
+        response = app(environ, start_response)
+        try:
+            for _ in response:
+                pass
+        finally:
+            response.close()
+        return time.perf_counter() - started, status
+
+    def run_asgi(self, requests, concurrency):
+        app = ASGIHandler()
+
+        async def run():
+            pending = iter(requests)
+
+            async def worker():
+                return [
+                    await self.asgi_get(app, *request) for request in pending
+                ]
+
+            workers = await asyncio.gather(
+                *(worker() for _ in range(concurrency))
+            )
+            return [result for results in workers for result in results]
+
+        return asyncio.run(run())
+
+    def run_wsgi(self, requests, concurrency):
+        app = WSGIHandler()
+        with ThreadPoolExecutor(concurrency) as executor:
+            return list(
+                executor.map(lambda request: self.wsgi_get(app, *request),
+                             requests)
+            )
+
+    def measure(self, run, request, count, concurrency):
+        run([request] * concurrency, concurrency)
+        started = time.perf_counter()
+        results = run([request] * count, concurrency)
+        elapsed = time.perf_counter() - started
+
+        timings = [seconds * 1000 for seconds, _ in results]
+        percentiles = statistics.quantiles(timings, n=100, method="inclusive")
+        return {
+            "rps": len(results) / elapsed,
+            "p50": percentiles[49],
+            "p95": percentiles[94],
+            "p99": percentiles[98],
+            "errors": sum(status != 200 for _, status in results),
+        }
+
+    def handle(self, *args, **options):
+        count = max(options["requests"], 2)
+        self.stdout.write(
+            f"{'scenario':<38}{'server':>7}{'conc':>6}{'req/s':>9}"
+            f"{'p50':>9}{'p95':>9}{'p99':>9}{'errors':>8}"
+        )
+        overrides = {"ALLOWED_HOSTS": ["*"]}
+        if not options["cache"]:
+            overrides["BOOK_CACHE_TIMEOUT"] = 0
+        with (
+            override_settings(**overrides),
+            mock.patch.object(APIView, "get_throttles", return_value=[]),
+        ):
+            for name, path, async_path, params, authorization in (
+                self.scenarios()
+            ):
+                if options["match"] and options["match"] not in name:
+                    continue
+                query = urlencode(params)
+                servers = (
+                    ("wsgi", self.run_wsgi, path),
+                    ("asgi", self.run_asgi, async_path),
+                )
+                for concurrency in options["concurrency"]:
+                    for server, run, url in servers:
+                        result = self.measure(
+                            run, (url, query, authorization), count,
+                            concurrency,
+                        )
+                        line = (
+                            f"{name:<38}{server:>7}{concurrency:>6}"
+                            f"{result['rps']:>9.1f}{result['p50']:>9.2f}"
+                            f"{result['p95']:>9.2f}{result['p99']:>9.2f}"
+                            f"{result['errors']:>8}"
+                        )
+                        if result["errors"]:
+                            line = self.style.ERROR(line)
+                        self.stdout.write(line)
+
+        self.stdout.write(
+            f"Latency in ms, database: {connection.vendor}, "
+            f"requests: {count}"
+        )
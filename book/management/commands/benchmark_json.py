@@ -0,0 +1,87 @@
+import io
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from book.models import Book
+from book.serializers import BookListSerializer, BookSerializer
+from borrowing.models import Borrowing
+from borrowing.serializers import BorrowingListSerializer
+from library_service.parsers import ORJSONParser
+from library_service.renderers import ORJSONRenderer
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the stdlib and orjson renderers and
+    parsers on book and borrowing list pages.
+    """
+
+    help = "Benchmark the JSON renderers and parsers on API pages"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=200)
+
+    def pages(self, page_size):
+        books = Book.objects.all()[:page_size]
+        borrowings = Borrowing.objects.all()[:page_size]
+        pages = {
+            "books": BookListSerializer(books, many=True).data,
+            "books, raw": list(
+                books.values(*BookSerializer.Meta.fields)
+            ),
+            "borrowings": BorrowingListSerializer(
+                borrowings, many=True
+            ).data,
+            "borrowings, raw": list(borrowings.values()),
+        }
+        for name, page in pages.items():
+            if not page:
+                raise CommandError(f"No {name}, seed the database first")
+        return {
+            name: {"count": len(page), "next": None, "results": page}
+            for name, page in pages.items()
+        }
+
+    @staticmethod
+    def measure(function, repeat):
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function()
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings)
+
+    def handle(self, *args, **options):
+        repeat = options["repeat"]
+        self.stdout.write(
+            f"{'page':<18}{'operation':<10}{'stdlib, ms':>12}"
+            f"{'orjson, ms':>12}{'speedup':>10}"
+        )
+        for name, page in self.pages(options["page_size"]).items():
+            content = JSONRenderer().render(page)
+            if ORJSONRenderer().render(page) != content:
+                raise CommandError(f"The {name} page renders differently")
+
+            for operation, stdlib, fast in (
+                (
+                    "render",
+                    lambda: JSONRenderer().render(page),
+                    lambda: ORJSONRenderer().render(page),
+                ),
+                (
+                    "parse",
+                    lambda: JSONParser().parse(io.BytesIO(content)),
+                    lambda: ORJSONParser().parse(io.BytesIO(content)),
+                ),
+            ):
+                slow = self.measure(stdlib, repeat)
+                quick = self.measure(fast, repeat)
+                self.stdout.write(
+                    f"{name:<18}{operation:<10}{slow:>12.3f}{quick:>12.3f}"
+                    f"{slow / max(quick, 1e-6):>9.1f}x"
+                )
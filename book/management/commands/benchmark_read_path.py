@@ -0,0 +1,75 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from rest_framework.renderers import JSONRenderer
+
+from book.models import Book
+from book.serializers import BookListSerializer
+from borrowing.models import Borrowing
+from borrowing.serializers import BorrowingListSerializer
+from library_service.values import ValuesRepresentation
+
+
+class Command(BaseCommand):
+    """
+    Django command to compare the serializer and values() read paths of
+    the book and borrowing lists: fetching a page, building the output
+    and rendering it to JSON. Both paths must render the same bytes.
+    """
+
+    help = "Benchmark the serializer and values() list read paths"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--page-size", type=int, default=100)
+        parser.add_argument("--repeat", type=int, default=50)
+
+    def serializer_path(self, queryset, serializer_class):
+        return serializer_class(queryset, many=True).data
+
+    def values_path(self, queryset, serializer_class):
+        representation = ValuesRepresentation(serializer_class())
+        return [
+            representation.to_representation(row)
+            for row in queryset.values(*representation.columns)
+        ]
+
+    def measure(self, path, queryset, serializer_class, repeat):
+        renderer = JSONRenderer()
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            content = renderer.render(path(queryset.all(), serializer_class))
+            timings.append((time.perf_counter() - started) * 1000)
+        return statistics.median(timings), content
+
+    def handle(self, *args, **options):
+        page_size, repeat = options["page_size"], options["repeat"]
+        scenarios = {
+            "books": (Book.objects.all()[:page_size], BookListSerializer),
+            "borrowings": (
+                Borrowing.objects.all()[:page_size],
+                BorrowingListSerializer,
+            ),
+        }
+
+        self.stdout.write(
+            f"{'list':<12}{'rows':>6}{'serializer, ms':>16}"
+            f"{'values, ms':>12}{'speedup':>10}"
+        )
+        for name, (queryset, serializer_class) in scenarios.items():
+            rows = queryset.count()
+            if not rows:
+                raise CommandError(f"No {name}, seed the database first")
+            slow, expected = self.measure(
+                self.serializer_path, queryset, serializer_class, repeat
+            )
+            fast, content = self.measure(
+                self.values_path, queryset, serializer_class, repeat
+            )
+            if content != expected:
+                raise CommandError(f"The {name} read paths render differently")
+            self.stdout.write(
+                f"{name:<12}{rows:>6}{slow:>16.2f}{fast:>12.2f}"
+                f"{slow / max(fast, 1e-6):>9.1f}x"
+            )
@@ -0,0 +1,60 @@
+import sys
+
+from django.core.management import BaseCommand
+
+from book.models import Book
+from book.serializers import BookListSerializer
+from borrowing.models import Borrowing
+from borrowing.serializers import BorrowingListSerializer
+from library_service.export import EXPORT_CONTENT_TYPES, export_content
+from library_service.routers import replica_reads
+from library_service.values import ValuesRepresentation
+
+
+EXPORTS = {
+    "books": (Book, BookListSerializer),
+    "borrowings": (Borrowing, BorrowingListSerializer),
+}
+
+
+class Command(BaseCommand):
+    """
+    Django command to export the catalog or the borrowing history as
+    NDJSON or CSV, in the format of the staff export endpoints, read
+    from a replica when there is one
+    """
+
+    help = "Export books or borrowings as NDJSON or CSV"
+
+    def add_arguments(self, parser):
+        parser.add_argument("model", choices=list(EXPORTS))
+        parser.add_argument(
+            "--export-format", choices=list(EXPORT_CONTENT_TYPES),
+            default="ndjson",
+        )
+        parser.add_argument(
+            "--output", default="-", help="File path, - for stdout"
+        )
+        parser.add_argument("--chunk-size", type=int)
+
+    def handle(self, *args, **options):
+        model, serializer_class = EXPORTS[options["model"]]
+        with replica_reads():
+            queryset = model.objects.all()
+            queryset = queryset.using(queryset.db)
+        content = export_content(
+            queryset,
+            ValuesRepresentation(serializer_class()),
+            options["export_format"],
+            options["chunk_size"],
+        )
+
+        if options["output"] == "-":
+            for chunk in content:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        with open(options["output"], "wb") as output:
+            for chunk in content:
+                output.write(chunk)
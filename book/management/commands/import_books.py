@@ -0,0 +1,44 @@
+import json
+
+from django.core.management import BaseCommand
+
+from book.importer import BookImport, IMPORT_FORMATS, guess_import_format
+
+
+class Command(BaseCommand):
+    """
+    Django command to create or update books from a CSV or JSON Lines
+    file, in the format of the staff books/import/ endpoint
+    """
+
+    help = "Import books from a CSV or JSON Lines file"
+
+    def add_arguments(self, parser):
+        parser.add_argument("path")
+        parser.add_argument("--import-format", choices=IMPORT_FORMATS)
+        parser.add_argument("--batch-size", type=int)
+        parser.add_argument(
+            "--no-copy",
+            action="store_true",
+            help="Insert with bulk_create instead of COPY on PostgreSQL",
+        )
+
+    def handle(self, *args, **options):
+        path = options["path"]
+        import_format = options["import_format"] or guess_import_format(path)
+        book_import = BookImport(
+            batch_size=options["batch_size"],
+            use_copy=not options["no_copy"],
+        )
+        with open(path, "rb") as stream:
+            report = book_import.run(stream, import_format)
+
+        for error in report["errors"]:
+            self.stderr.write(
+                f"Line {error['line']}: {json.dumps(error['errors'])}"
+            )
+        self.stdout.write(
+            f"Rows: {report['rows']}, created: {report['created']}, "
+            f"updated: {report['updated']}, failed: {report['failed']}, "
+            f"{report['rows_per_second']} rows/s"
+        )
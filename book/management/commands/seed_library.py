@@ -0,0 +1,205 @@
+import contextlib
+import random
+import time
+from datetime import date, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.management import BaseCommand, CommandError
+from django.db import transaction
+
+from book.cache import bump_catalog_version
+from book.models import Book
+from borrowing.models import Borrowing
+
+
+WORDS = (
+    "Silent", "River", "Shadow", "Glass", "Winter", "Garden", "Lost",
+    "City", "Iron", "Crown", "Ocean", "Night", "Paper", "Storm", "Golden",
+    "Forest", "Empire", "Letters", "Stone", "Fire", "Journey", "House",
+    "Secret", "Light", "Mountain", "Dream", "Song", "Road", "Memory", "Sky",
+)
+FIRST_NAMES = (
+    "Anna", "Oleg", "Maria", "Ivan", "Sofia", "Taras", "Olena", "Dmytro",
+    "Kateryna", "Andrii", "Iryna", "Mykola", "Yulia", "Petro", "Nadia",
+)
+LAST_NAMES = (
+    "Shevchenko", "Kovalenko", "Bondarenko", "Tkachenko", "Kravchenko",
+    "Melnyk", "Boyko", "Koval", "Oliynyk", "Lysenko", "Marchenko",
+)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def skewed_choice(rng, items, skew):
+    """Pick from `items`, the first ones far more often for skew > 1"""
+    return items[int(len(items) * rng.random() ** skew)]
+
+
+@contextlib.contextmanager
+def explicit_borrow_dates():
+    """Let bulk_create keep the given borrow_date despite auto_now_add"""
+    field = Borrowing._meta.get_field("borrow_date")
+    field.auto_now_add = False
+    try:
+        yield
+    finally:
+        field.auto_now_add = True
+
+
+class Command(BaseCommand):
+    """
+    Django command to fill the database with a large synthetic library:
+    books, users and a borrowing history with popular titles borrowed
+    far more often, returned borrowings and a fraction of overdue ones.
+
+    Rows are generated lazily and bulk inserted in batches, and the same
+    seed on the same empty database always gives the same data.
+    """
+
+    help = "Generate books, users and borrowings for load testing"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--books", type=int, default=10000)
+        parser.add_argument("--users", type=int, default=10000)
+        parser.add_argument("--borrowings", type=int, default=1000000)
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--batch-size", type=int, default=5000)
+        parser.add_argument(
+            "--days", type=int, default=3 * 365,
+            help="Span of the borrowing history",
+        )
+        parser.add_argument(
+            "--returned", type=float, default=0.85,
+            help="Fraction of returned borrowings",
+        )
+        parser.add_argument(
+            "--overdue", type=float, default=0.3,
+            help="Fraction of the active borrowings that are overdue",
+        )
+        parser.add_argument(
+            "--popularity-skew", type=float, default=3.0,
+            help="How much the first books are favoured, 1 is uniform",
+        )
+        parser.add_argument(
+            "--password", default="library12345",
+            help="Password of every generated user",
+        )
+
+    def generate_books(self, rng, count):
+        for _ in range(count):
+            yield Book(
+                title=" ".join(rng.sample(WORDS, rng.randint(1, 4))),
+                author=f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}",
+                cover=rng.choice(Book.CoverChoices.values),
+                inventory=rng.randint(1, 20),
+                daily_fee=Decimal(rng.randint(50, 500)) / 100,
+            )
+
+    def generate_users(self, rng, count, offset, password):
+        # Hashing once instead of per user keeps this from taking hours
+        password = make_password(password)
+        for number in range(offset, offset + count):
+            yield get_user_model()(
+                email=f"reader{number}@library.example",
+                password=password,
+                first_name=rng.choice(FIRST_NAMES),
+                last_name=rng.choice(LAST_NAMES),
+            )
+
+    def generate_borrowings(self, rng, count, book_ids, user_ids, options):
+        today = date.today()
+        for _ in range(count):
+            duration = rng.randint(7, 30)
+            actual_return_date = None
+            if rng.random() < options["returned"]:
+                borrow_date = today - timedelta(
+                    days=rng.randint(1, options["days"])
+                )
+                actual_return_date = min(
+                    borrow_date + timedelta(days=rng.randint(1, duration + 7)),
+                    today,
+                )
+            elif rng.random() < options["overdue"]:
+                borrow_date = today - timedelta(
+                    days=rng.randint(duration + 1, duration + 60)
+                )
+            else:
+                borrow_date = today - timedelta(
+                    days=rng.randint(0, duration)
+                )
+            yield Borrowing(
+                borrow_date=borrow_date,
+                expected_return_date=borrow_date + timedelta(days=duration),
+                actual_return_date=actual_return_date,
+                book_id=skewed_choice(
+                    rng, book_ids, options["popularity_skew"]
+                ),
+                user_id=skewed_choice(rng, user_ids, 1.5),
+            )
+
+    def insert(self, name, model, rows, batch_size, return_ids=True):
+        started = time.perf_counter()
+        last_id = (
+            model.objects.order_by("-id").values_list("id", flat=True).first()
+            or 0
+        )
+        inserted = 0
+        for batch in batched(rows, batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch)
+            inserted += len(batch)
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"{name}: {inserted} in {elapsed:.1f}s "
+            f"({inserted / max(elapsed, 1e-6):.0f} rows/s)"
+        )
+        if not return_ids:
+            return None
+        return list(
+            model.objects.filter(id__gt=last_id)
+            .order_by("id")
+            .values_list("id", flat=True)
+        )
+
+    def handle(self, *args, **options):
+        rng = random.Random(options["seed"])
+        batch_size = options["batch_size"]
+
+        book_ids = self.insert(
+            "Books",
+            Book,
+            self.generate_books(rng, options["books"]),
+            batch_size,
+        )
+        user_ids = self.insert(
+            "Users",
+            get_user_model(),
+            self.generate_users(
+                rng,
+                options["users"],
+                get_user_model().objects.count(),
+                options["password"],
+            ),
+            batch_size,
+        )
+        if options["borrowings"] and not (book_ids and user_ids):
+            raise CommandError("Borrowings need at least one book and user")
+
+        with explicit_borrow_dates():
+            self.insert(
+                "Borrowings",
+                Borrowing,
+                self.generate_borrowings(
+                    rng, options["borrowings"], book_ids, user_ids, options
+                ),
+                batch_size,
+                return_ids=False,
+            )
+        bump_catalog_version()
@@ -0,0 +1,82 @@
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+POSTGRES_FORWARD_SQL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    """
+    CREATE OR REPLACE FUNCTION book_book_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A')
+            || setweight(to_tsvector('simple', coalesce(NEW.author, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    """
+    CREATE TRIGGER book_book_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF title, author ON book_book
+    FOR EACH ROW EXECUTE FUNCTION book_book_search_vector_update()
+    """,
+    "UPDATE book_book SET title = title",
+    "CREATE INDEX book_book_search_vector_gin "
+    "ON book_book USING gin (search_vector)",
+    "CREATE INDEX book_book_title_trgm "
+    "ON book_book USING gin (title gin_trgm_ops)",
+    "CREATE INDEX book_book_author_trgm "
+    "ON book_book USING gin (author gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS book_book_author_trgm",
+    "DROP INDEX IF EXISTS book_book_title_trgm",
+    "DROP INDEX IF EXISTS book_book_search_vector_gin",
+    "DROP TRIGGER IF EXISTS book_book_search_vector_trigger ON book_book",
+    "DROP FUNCTION IF EXISTS book_book_search_vector_update()",
+]
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="book",
+            options={"ordering": ["id"]},
+        ),
+        migrations.AlterField(
+            model_name="book",
+            name="cover",
+            field=models.CharField(
+                choices=[("Hard", "Hard"), ("Soft", "Soft")],
+                db_index=True,
+                max_length=5,
+            ),
+        ),
+        migrations.AddField(
+            model_name="book",
+            name="search_vector",
+            field=django.contrib.postgres.search.SearchVectorField(
+                editable=False, null=True
+            ),
+        ),
+        migrations.RunPython(
+            _run_on_postgres(POSTGRES_FORWARD_SQL),
+            _run_on_postgres(POSTGRES_REVERSE_SQL),
+        ),
+    ]
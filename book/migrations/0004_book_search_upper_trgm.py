@@ -0,0 +1,46 @@
+from django.db import migrations
+
+
+# Django compiles icontains to UPPER("title"::text) LIKE UPPER(%s) on
+# PostgreSQL, only an index on that same expression can serve it
+POSTGRES_FORWARD_SQL = [
+    "DROP INDEX IF EXISTS book_book_title_trgm",
+    "DROP INDEX IF EXISTS book_book_author_trgm",
+    "CREATE INDEX book_book_title_upper_trgm "
+    "ON book_book USING gin ((UPPER(title::text)) gin_trgm_ops)",
+    "CREATE INDEX book_book_author_upper_trgm "
+    "ON book_book USING gin ((UPPER(author::text)) gin_trgm_ops)",
+]
+
+POSTGRES_REVERSE_SQL = [
+    "DROP INDEX IF EXISTS book_book_author_upper_trgm",
+    "DROP INDEX IF EXISTS book_book_title_upper_trgm",
+    "CREATE INDEX book_book_title_trgm "
+    "ON book_book USING gin (title gin_trgm_ops)",
+    "CREATE INDEX book_book_author_trgm "
+    "ON book_book USING gin (author gin_trgm_ops)",
+]
+
+
+def _run_on_postgres(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != "postgresql":
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("book", "0003_book_updated_at"),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            _run_on_postgres(POSTGRES_FORWARD_SQL),
+            _run_on_postgres(POSTGRES_REVERSE_SQL),
+        ),
+    ]
@@ -1,7 +1,14 @@
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator
 from django.db import models
 
 
+class BookManager(models.Manager):
+    def get_queryset(self):
+        # Only the search ranking reads the vector, in the database
+        return super().get_queryset().defer("search_vector")
+
+
 class Book(models.Model):
     class CoverChoices(models.TextChoices):
         HARD = "Hard"
@@ -9,9 +16,17 @@ class Book(models.Model):
 
     title = models.CharField(max_length=255)
     author = models.CharField(max_length=255)
-    cover = models.CharField(max_length=5, choices=CoverChoices.choices)
+    cover = models.CharField(
+        max_length=5, choices=CoverChoices.choices, db_index=True
+    )
     inventory = models.IntegerField(validators=[MinValueValidator(1)])
     daily_fee = models.DecimalField(decimal_places=2, max_digits=6)
+    updated_at = models.DateTimeField(auto_now=True)
+    # Maintained by a database trigger on PostgreSQL (see migration 0002),
+    # always NULL on other backends.
+    search_vector = SearchVectorField(null=True, editable=False)
+
+    objects = BookManager()
 
     def __str__(self) -> str:
         return (
@@ -0,0 +1,48 @@
+from django.contrib.postgres.search import SearchQuery, SearchRank
+from django.db import connections
+from django.db.models import F
+
+from book.models import Book
+
+
+SEARCH_CONFIG = "simple"
+
+
+def normalize_cover(cover):
+    """Map a ?cover= value to a Book.CoverChoices value (case-insensitive)"""
+    cover = cover.strip().lower()
+    for choice in Book.CoverChoices.values:
+        if choice.lower() == cover:
+            return choice
+    return None
+
+
+def search_books(queryset, title=None, author=None):
+    """
+    Filter books by title and/or author substrings.
+
+    On PostgreSQL the substring filters are served by the pg_trgm GIN
+    indexes on UPPER(title) and UPPER(author) (see migration 0004) and the results are ranked against the trigger-maintained
+    search vector (title weighted above author). Other backends fall back
+    to a plain icontains filter in the default ordering.
+    """
+    terms = {"title": title, "author": author}
+    terms = {field: term for field, term in terms.items() if term}
+    if not terms:
+        return queryset
+
+    queryset = queryset.filter(
+        **{f"{field}__icontains": term for field, term in terms.items()}
+    )
+
+    if connections[queryset.db].vendor != "postgresql":
+        return queryset
+
+    query = SearchQuery(
+        " ".join(terms.values()),
+        config=SEARCH_CONFIG,
+        search_type="websearch",
+    )
+    return queryset.annotate(
+        rank=SearchRank(F("search_vector"), query)
+    ).order_by("-rank", "id")
@@ -1,6 +1,7 @@
 from rest_framework import serializers
 
 from book.models import Book
+from library_service.fields import SparseFieldsSerializerMixin
 
 
 class BookSerializer(serializers.ModelSerializer):
@@ -16,7 +17,7 @@ class BookSerializer(serializers.ModelSerializer):
         )
 
 
-class BookListSerializer(BookSerializer):
+class BookListSerializer(SparseFieldsSerializerMixin, BookSerializer):
     class Meta:
         model = Book
         fields = (
@@ -27,3 +28,7 @@ class BookListSerializer(BookSerializer):
             "inventory",
             "daily_fee_in_usd",
         )
+        sparse_sources = {"daily_fee_in_usd": ("daily_fee",)}
+        value_converters = {
+            "daily_fee_in_usd": lambda row: f"{row['daily_fee']}$",
+        }
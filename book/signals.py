@@ -0,0 +1,21 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from book.cache import (
+    bump_catalog_version,
+    delete_book_stamp,
+    set_book_stamp,
+)
+from book.models import Book
+
+
+@receiver(post_save, sender=Book)
+def book_saved(sender, instance, **kwargs):
+    set_book_stamp(instance.pk, instance.updated_at)
+    bump_catalog_version()
+
+
+@receiver(post_delete, sender=Book)
+def book_deleted(sender, instance, **kwargs):
+    delete_book_stamp(instance.pk)
+    bump_catalog_version()
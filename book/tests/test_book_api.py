@@ -1,16 +1,31 @@
+import base64
+import json
+from collections import OrderedDict
+from datetime import date, datetime, timezone
 from decimal import Decimal
 
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
+from rest_framework.renderers import JSONRenderer
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 
 from book.models import Book
 from book.serializers import BookListSerializer
+from library_service.renderers import ORJSONRenderer
 
 BOOK_URL = reverse("book:book-list")
+EXPORT_URL = reverse("book:book-export")
+IMPORT_URL = reverse("book:book-import-books")
+ASYNC_BOOK_URL = reverse("book:book-list-async")
 
 
 def sample_book(**kwargs):
@@ -29,8 +44,10 @@ def detail_url(book_id):
     return reverse("book:book-detail", args=[book_id])
 
 
+@override_settings(DATABASE_REPLICAS=[])
 class UnauthenticatedBookApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
 
     def test_auth_required(self):
@@ -56,8 +73,10 @@ class UnauthenticatedBookApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@override_settings(DATABASE_REPLICAS=[])
 class AuthenticatedBookApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             "user@user.com",
@@ -65,6 +84,10 @@ class AuthenticatedBookApiTests(TestCase):
         )
         self.client.force_authenticate(self.user)
 
+    def test_import_books_forbidden_auth_user(self):
+        res = self.client.post(IMPORT_URL, {})
+        self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
     def test_delete_book_forbidden_auth_user(self):
         book = sample_book()
         url = detail_url(book.id)
@@ -103,6 +126,136 @@ class AuthenticatedBookApiTests(TestCase):
         self.assertIn(serializer2.data, res_2.data["results"])
         self.assertNotIn(serializer1.data, res_2.data["results"])
 
+    def test_filter_books_by_cover_is_exact_and_case_insensitive(self):
+        soft_book = sample_book(cover="Soft")
+        hard_book = sample_book(cover="Hard")
+
+        res_hard = self.client.get(BOOK_URL, {"cover": "hard"})
+        res_partial = self.client.get(BOOK_URL, {"cover": "So"})
+
+        self.assertIn(
+            BookListSerializer(hard_book).data, res_hard.data["results"]
+        )
+        self.assertNotIn(
+            BookListSerializer(soft_book).data, res_hard.data["results"]
+        )
+        self.assertEqual(res_partial.data["results"], [])
+
+    def test_search_books_by_title_substring(self):
+        book = sample_book(title="Roadside Picnic")
+        sample_book(title="Metro 2033")
+
+        res = self.client.get(BOOK_URL, {"title": "picnic"})
+
+        self.assertEqual(
+            res.data["results"], [BookListSerializer(book).data]
+        )
+
+    def test_book_queries_skip_search_vector(self):
+        sample_book()
+
+        with CaptureQueriesContext(connection) as queries:
+            book = Book.objects.get()
+
+        self.assertNotIn("search_vector", queries[0]["sql"])
+        self.assertIn("search_vector", book.get_deferred_fields())
+
+    def test_list_books_cursor_pagination(self):
+        books = [sample_book(title=f"Book {i}") for i in range(7)]
+
+        with self.assertNumQueries(1):
+            res_1 = self.client.get(BOOK_URL, {"pagination": "cursor"})
+        res_2 = self.client.get(res_1.data["next"])
+
+        self.assertNotIn("count", res_1.data)
+        self.assertEqual(
+            [book["id"] for book in res_1.data["results"]],
+            [book.id for book in books[:5]],
+        )
+        self.assertEqual(
+            [book["id"] for book in res_2.data["results"]],
+            [book.id for book in books[5:]],
+        )
+        self.assertIsNone(res_2.data["next"])
+
+    def test_list_books_invalid_cursor(self):
+        res = self.client.get(BOOK_URL, {"cursor": "not-a-cursor"})
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_books_cursor_with_wrong_types(self):
+        for values in (["abc"], [None], [[1]]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode())
+
+            res = self.client.get(BOOK_URL, {"cursor": cursor.decode()})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_books_by_ids(self):
+        books = [sample_book(title=f"Book {i}") for i in range(3)]
+
+        res = self.client.get(
+            BOOK_URL, {"ids": f"{books[0].id},{books[2].id}"}
+        )
+        res_invalid = self.client.get(BOOK_URL, {"ids": "1,a"})
+
+        self.assertEqual(
+            res.data,
+            BookListSerializer([books[0], books[2]], many=True).data,
+        )
+        self.assertEqual(res_invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_list_books_by_ids_unpaginated_up_to_limit(self):
+        books = [sample_book(title=f"Book {i}") for i in range(7)]
+        ids = ",".join(str(book.id) for book in books)
+
+        res = self.client.get(BOOK_URL, {"ids": ids})
+        res_too_many = self.client.get(
+            BOOK_URL, {"ids": ",".join(map(str, range(1, 102)))}
+        )
+
+        self.assertEqual(len(res.data), 7)
+        self.assertEqual(
+            res_too_many.status_code, status.HTTP_400_BAD_REQUEST
+        )
+
+    def test_list_books_sparse_fields(self):
+        sample_book()
+
+        with CaptureQueriesContext(connection) as queries:
+            res = self.client.get(BOOK_URL, {"fields": "id,daily_fee_in_usd"})
+        select = queries.captured_queries[-1]["sql"]
+        res_omit = self.client.get(BOOK_URL, {"omit": "inventory,cover"})
+
+        self.assertEqual(
+            list(res.data["results"][0]), ["id", "daily_fee_in_usd"]
+        )
+        self.assertIn('"daily_fee"', select)
+        self.assertNotIn('"title"', select)
+        self.assertEqual(
+            list(res_omit.data["results"][0]),
+            ["id", "title", "author", "daily_fee_in_usd"],
+        )
+
+    def test_values_read_path_same_json_as_serializer(self):
+        book = sample_book(daily_fee=Decimal("10"))
+        sample_book(title="Second", cover="Hard", daily_fee=Decimal("0.5"))
+        requests = [
+            (BOOK_URL, {"page_size": 100}),
+            (BOOK_URL, {"pagination": "cursor", "page_size": 1}),
+            (BOOK_URL, {"fields": "title,daily_fee_in_usd"}),
+            (detail_url(book.id), {}),
+        ]
+
+        for url, params in requests:
+            res = self.client.get(url, params)
+            cache.clear()
+            with override_settings(VALUES_READ_PATH=False):
+                expected = self.client.get(url, params)
+            cache.clear()
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected.content)
+
     def test_retrieve_book_detail(self):
         book = sample_book()
 
@@ -114,6 +267,89 @@ class AuthenticatedBookApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_200_OK)
         self.assertEqual(res.data, serializer.data)
 
+    def test_list_book_is_cached_until_book_saved(self):
+        book = sample_book(title="Cached")
+        self.client.get(BOOK_URL)
+
+        Book.objects.filter(id=book.id).update(title="Not saved")
+        res_cached = self.client.get(BOOK_URL)
+
+        book.refresh_from_db()
+        book.save()
+        res_fresh = self.client.get(BOOK_URL)
+
+        self.assertEqual(res_cached.data["results"][0]["title"], "Cached")
+        self.assertEqual(res_fresh.data["results"][0]["title"], "Not saved")
+
+    def test_cache_key_ignores_param_order_and_first_page(self):
+        sample_book()
+        self.client.get(BOOK_URL, {"title": "Test", "cover": "Soft"})
+
+        with self.assertNumQueries(0):
+            self.client.get(BOOK_URL, {"cover": "Soft", "title": "Test"})
+            self.client.get(
+                BOOK_URL, {"cover": "Soft", "title": "Test", "page": 1}
+            )
+
+    def test_retrieve_book_not_modified_without_queries(self):
+        book = sample_book()
+        url = detail_url(book.id)
+        res = self.client.get(url)
+
+        with self.assertNumQueries(0):
+            res_not_modified = self.client.get(
+                url, HTTP_IF_NONE_MATCH=res["ETag"]
+            )
+
+        book.title = "Changed"
+        book.save()
+        res_modified = self.client.get(url, HTTP_IF_NONE_MATCH=res["ETag"])
+
+        self.assertEqual(
+            res_not_modified.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+        self.assertEqual(res_not_modified["ETag"], res["ETag"])
+        self.assertEqual(res_modified.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(res_modified["ETag"], res["ETag"])
+
+    def test_retrieve_book_etag_depends_on_fields(self):
+        url = detail_url(sample_book().id)
+        res = self.client.get(url)
+
+        res_fields = self.client.get(
+            url, {"fields": "title"}, HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+        res_fields_again = self.client.get(
+            url, {"fields": "title"}, HTTP_IF_NONE_MATCH=res_fields["ETag"]
+        )
+
+        self.assertEqual(res_fields.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_fields.data, {"title": "Test Book 248"})
+        self.assertEqual(
+            res_fields_again.status_code, status.HTTP_304_NOT_MODIFIED
+        )
+
+    def test_list_book_conditional_get(self):
+        sample_book()
+        res = self.client.get(BOOK_URL)
+
+        res_etag = self.client.get(BOOK_URL, HTTP_IF_NONE_MATCH=res["ETag"])
+        res_date = self.client.get(
+            BOOK_URL, HTTP_IF_MODIFIED_SINCE=res["Last-Modified"]
+        )
+        res_other_page = self.client.get(
+            BOOK_URL, {"cover": "Hard"}, HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+        sample_book(title="New")
+        res_changed = self.client.get(
+            BOOK_URL, HTTP_IF_NONE_MATCH=res["ETag"]
+        )
+
+        self.assertEqual(res_etag.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res_date.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(res_other_page.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_changed.status_code, status.HTTP_200_OK)
+
     def test_create_book_forbidden(self):
         book = {
             "title": "Test Book 248",
@@ -127,8 +363,79 @@ class AuthenticatedBookApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
 
 
+@override_settings(DATABASE_REPLICAS=[])
+class AsyncBookApiTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com",
+            "user12345",
+        )
+        self.client.force_authenticate(self.user)
+        self.token = str(AccessToken.for_user(self.user))
+
+    def async_get(self, url, params=None, token=None):
+        async def get():
+            return await self.async_client.get(
+                url,
+                params or {},
+                AUTHORIZATION=f"Bearer {token or self.token}",
+            )
+
+        return async_to_sync(get)()
+
+    def test_async_read_same_json_as_wsgi(self):
+        book = sample_book(daily_fee=Decimal("10"))
+        for number in range(6):
+            sample_book(title=f"Second {number}", cover="Hard")
+        ids = ",".join(map(str, Book.objects.values_list("id", flat=True)))
+        requests = [
+            (BOOK_URL, ASYNC_BOOK_URL, {}),
+            (BOOK_URL, ASYNC_BOOK_URL, {"page": 2}),
+            (BOOK_URL, ASYNC_BOOK_URL, {"page": "last", "page_size": 3}),
+            (BOOK_URL, ASYNC_BOOK_URL, {"title": "second", "cover": "hard"}),
+            (BOOK_URL, ASYNC_BOOK_URL, {"pagination": "cursor"}),
+            (BOOK_URL, ASYNC_BOOK_URL, {"fields": "id,daily_fee_in_usd"}),
+            (BOOK_URL, ASYNC_BOOK_URL, {"ids": ids}),
+            (
+                detail_url(book.id),
+                reverse("book:book-detail-async", args=[book.id]),
+                {},
+            ),
+        ]
+
+        for url, async_url, params in requests:
+            expected = self.client.get(url, params)
+            res = self.async_get(async_url, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                res.content.replace(b"/async", b""), expected.content
+            )
+
+    def test_async_read_errors(self):
+        missing = self.async_get(
+            reverse("book:book-detail-async", args=[404])
+        )
+        invalid_page = self.async_get(ASYNC_BOOK_URL, {"page": 9})
+        invalid_token = self.async_get(ASYNC_BOOK_URL, token="invalid")
+
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(invalid_page.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(
+            invalid_token.status_code, status.HTTP_401_UNAUTHORIZED
+        )
+        self.assertEqual(
+            invalid_token["WWW-Authenticate"], 'Bearer realm="api"'
+        )
+        self.assertEqual(invalid_token.json()["code"], "token_not_valid")
+
+
+@override_settings(DATABASE_REPLICAS=[])
 class AdminBookApiTests(TestCase):
     def setUp(self):
+        cache.clear()
         self.client = APIClient()
         self.user = get_user_model().objects.create_user(
             "admin@admin.com",
@@ -152,8 +459,124 @@ class AdminBookApiTests(TestCase):
         for key in params:
             self.assertEqual(params[key], getattr(book, key))
 
+    def test_create_book_json_body(self):
+        res = self.client.post(
+            BOOK_URL,
+            {
+                "title": "Тест",
+                "author": "Oleg",
+                "cover": "Hard",
+                "inventory": 1,
+                "daily_fee": "0.50",
+            },
+            format="json",
+        )
+        invalid = self.client.post(
+            BOOK_URL, b"{", content_type="application/json"
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.json()["title"], "Тест")
+        self.assertEqual(res.json()["daily_fee"], "0.50")
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("JSON parse error", invalid.json()["detail"])
+
+    def test_import_books_csv_upsert_and_row_errors(self):
+        book = sample_book()
+        self.client.get(BOOK_URL)
+        upload = SimpleUploadedFile(
+            "books.csv",
+            b"id,title,author,cover,inventory,daily_fee\n"
+            b"1,Renamed,Oleg,Soft,5,1.50\n"
+            b",New Book,Ann,Hard,3,2.00\n"
+            b",Broken,Ann,Glass,0,2.00\n",
+        )
+
+        res = self.client.post(IMPORT_URL, {"file": upload})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            {key: res.data[key] for key in ("rows", "created", "updated")},
+            {"rows": 3, "created": 1, "updated": 1},
+        )
+        self.assertEqual(res.data["failed"], 1)
+        self.assertEqual(res.data["errors"][0]["line"], 4)
+        self.assertEqual(
+            set(res.data["errors"][0]["errors"]), {"cover", "inventory"}
+        )
+        book.refresh_from_db()
+        self.assertEqual((book.title, book.inventory), ("Renamed", 5))
+        titles = [
+            row["title"] for row in self.client.get(BOOK_URL).data["results"]
+        ]
+        self.assertEqual(titles, ["Renamed", "New Book"])
+
+    def test_import_books_jsonl(self):
+        upload = SimpleUploadedFile(
+            "books.jsonl",
+            b'{"title": "A", "author": "B", "cover": "Hard", '
+            b'"inventory": 1, "daily_fee": "1.00"}\n'
+            b"{not json\n"
+            b"\n"
+            b"[1, 2]\n",
+        )
+
+        res = self.client.post(IMPORT_URL, {"file": upload})
+
+        self.assertEqual(res.data["created"], 1)
+        self.assertEqual(
+            [error["line"] for error in res.data["errors"]], [2, 4]
+        )
+        self.assertEqual(Book.objects.get().title, "A")
+
+    def test_export_books_ndjson(self):
+        book = sample_book()
+        sample_book(title="Other", cover="Hard")
+
+        res = self.client.get(EXPORT_URL, {"cover": "soft"})
+        invalid = self.client.get(EXPORT_URL, {"export_format": "xml"})
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "application/x-ndjson")
+        lines = b"".join(res.streaming_content).splitlines()
+        self.assertEqual(
+            [json.loads(line) for line in lines],
+            [dict(BookListSerializer(book).data)],
+        )
+        self.assertEqual(invalid.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_cache_stats(self):
+        sample_book()
+        self.client.get(BOOK_URL)
+        self.client.get(BOOK_URL)
+
+        res = self.client.get(reverse("stats"))
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res.data["book_cache"]["hits"], 1)
+        self.assertEqual(res.data["book_cache"]["misses"], 1)
+
     def test_delete_book_admin(self):
         book = sample_book()
         url = detail_url(book.id)
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_204_NO_CONTENT)
+
+
+class ORJSONRendererTests(SimpleTestCase):
+    def test_same_bytes_as_json_renderer(self):
+        data = {
+            "results": [
+                OrderedDict(id=1, daily_fee=Decimal("10.50"), title="Ünï"),
+                {"borrow_date": date(2023, 1, 2), "is_active": None},
+            ],
+            "created": datetime(2023, 1, 2, 3, 4, 5, 678901, timezone.utc),
+            "ids": (1, 2),
+            7: "line\u2028separator",
+        }
+
+        for context in ({}, {"indent": 4}):
+            self.assertEqual(
+                ORJSONRenderer().render(data, renderer_context=context),
+                JSONRenderer().render(data, renderer_context=context),
+            )
@@ -0,0 +1,97 @@
+from datetime import date
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+
+from book.models import Book
+from borrowing.models import Borrowing, OutboxMessage
+
+
+def seed(**options):
+    defaults = {"books": 20, "users": 5, "borrowings": 200, "seed": 7}
+    defaults.update(options)
+    call_command("seed_library", stdout=StringIO(), **defaults)
+
+
+def snapshot():
+    return (
+        list(Book.objects.values_list("title", "inventory", "daily_fee")),
+        list(
+            Borrowing.objects.order_by("id").values_list(
+                "borrow_date",
+                "expected_return_date",
+                "actual_return_date",
+                "book_id",
+            )
+        ),
+    )
+
+
+class SeedLibraryTests(TestCase):
+    def test_seed_library(self):
+        seed(batch_size=64)
+
+        self.assertEqual(Book.objects.count(), 20)
+        self.assertEqual(get_user_model().objects.count(), 5)
+        self.assertEqual(Borrowing.objects.count(), 200)
+        self.assertTrue(
+            get_user_model().objects.first().check_password("library12345")
+        )
+        self.assertGreater(
+            Borrowing.objects.filter(borrow_date__lt=date.today()).count(),
+            100,
+        )
+        self.assertTrue(
+            Borrowing.objects.filter(
+                actual_return_date__isnull=True,
+                expected_return_date__lt=date.today(),
+            ).exists()
+        )
+        self.assertTrue(
+            Borrowing._meta.get_field("borrow_date").auto_now_add
+        )
+
+    def test_seed_library_is_deterministic(self):
+        seed()
+        first = snapshot()
+        Borrowing.objects.all().delete()
+        Book.objects.all().delete()
+        get_user_model().objects.all().delete()
+
+        seed()
+        books, borrowings = snapshot()
+
+        self.assertEqual(books, first[0])
+        offset = Book.objects.order_by("id").first().id - 1
+        self.assertEqual(
+            [row[:3] + (row[3] - offset,) for row in borrowings],
+            first[1],
+        )
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class BenchmarkApiTests(TestCase):
+    def test_benchmark_leaves_dataset_unchanged(self):
+        seed()
+        before = snapshot()
+        users = get_user_model().objects.count()
+        out = StringIO()
+
+        with tempfile.TemporaryDirectory() as directory:
+            call_command(
+                "benchmark_api",
+                repeat=2,
+                warmup=0,
+                baseline=os.path.join(directory, "baseline.json"),
+                stdout=out,
+            )
+
+        self.assertIn("borrowing checkout", out.getvalue())
+        self.assertIn("borrowing return", out.getvalue())
+        self.assertEqual(snapshot(), before)
+        self.assertEqual(get_user_model().objects.count(), users)
+        self.assertFalse(OutboxMessage.objects.exists())
@@ -1,13 +1,24 @@
 from django.urls import path, include
 from rest_framework import routers
 from book.views import BookViewSet
+from library_service.async_views import AsyncValuesView
 
 router = routers.DefaultRouter()
 router.register("books", BookViewSet)
 
 
 urlpatterns = [
-    path("", include(router.urls))
+    path("", include(router.urls)),
+    path(
+        "async/books/",
+        AsyncValuesView.as_view(viewset_class=BookViewSet, action="list"),
+        name="book-list-async",
+    ),
+    path(
+        "async/books/<pk>/",
+        AsyncValuesView.as_view(viewset_class=BookViewSet, action="retrieve"),
+        name="book-detail-async",
+    ),
 ]
 
 app_name = "book"
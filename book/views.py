@@ -1,26 +1,56 @@
+from functools import partial
+
+from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import viewsets
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
+from book.cache import (
+    cached_response,
+    conditional_response,
+    detail_validators,
+    list_validators,
+)
+from book.importer import BookImport, IMPORT_FORMATS, guess_import_format
 from book.models import Book
 from book.permissions import IsAdminOrIfAuthenticatedReadOnly
+from book.search import normalize_cover, search_books
 from book.serializers import BookSerializer, BookListSerializer
+from library_service.export import (
+    EXPORT_FORMAT_PARAMETER,
+    EXPORT_RESPONSES,
+    export_response,
+)
+from library_service.fields import sparse_queryset
+from library_service.pagination import PageNumberOrKeysetPagination
+from library_service.query_params import params_to_ints
+from library_service.routers import ReplicaReadMixin
+from library_service.values import ValuesReadMixin, ValuesRepresentation
+
 
+# Books listed at once with ?ids=, unpaginated
+MAX_BOOK_IDS = 100
 
-class BookPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = "page_size"
-    max_page_size = 100
 
+class BookPagination(PageNumberOrKeysetPagination):
+    keyset_ordering = ("id",)
 
-class BookViewSet(viewsets.ModelViewSet):
+
+class BookViewSet(
+    ReplicaReadMixin, ValuesReadMixin, viewsets.ModelViewSet
+):
     queryset = Book.objects.all()
     serializer_class = BookSerializer
     pagination_class = BookPagination
     permission_classes = (IsAdminOrIfAuthenticatedReadOnly,)
+    throttle_scope = "books"
 
     def get_serializer_class(self):
-        if self.action in ("list", "retrieve"):
+        if self.action in ("list", "retrieve", "export"):
             return BookListSerializer
 
         return BookSerializer
@@ -30,38 +60,158 @@ class BookViewSet(viewsets.ModelViewSet):
         title = self.request.query_params.get("title")
         author = self.request.query_params.get("author")
         cover = self.request.query_params.get("cover")
+        ids = self.request.query_params.get("ids")
 
-        queryset = self.queryset
+        queryset = search_books(self.queryset, title=title, author=author)
 
-        if title:
-            queryset = queryset.filter(title__icontains=title)
-
-        if author:
-            queryset = queryset.filter(author__icontains=author)
+        if ids:
+            ids = set(params_to_ints(ids))
+            if len(ids) > MAX_BOOK_IDS:
+                raise ValidationError(
+                    f"Expected at most {MAX_BOOK_IDS} ids, got: {len(ids)}"
+                )
+            queryset = queryset.filter(id__in=ids)
 
         if cover:
-            queryset = queryset.filter(cover__icontains=cover)
+            cover = normalize_cover(cover)
+            if cover is None:
+                return queryset.none()
+            queryset = queryset.filter(cover=cover)
+
+        return queryset
+
+    @property
+    def paginator(self):
+        # All the books asked for with ?ids= come in one list
+        request = getattr(self, "request", None)
+        if request is not None and request.query_params.get("ids"):
+            return None
+        return super().paginator
 
-        return queryset.distinct()
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ("list", "retrieve"):
+            queryset = sparse_queryset(
+                queryset, self.get_serializer_class(), self.request
+            )
+        return queryset
 
     @extend_schema(
         parameters=[
             OpenApiParameter(
                 "title",
                 type=str,
-                description="Filter by title (ex. ?title=Test)",
+                description=(
+                    "Search by title, results are ranked "
+                    "(ex. ?title=Test)"
+                ),
             ),
             OpenApiParameter(
                 "author",
                 type=str,
-                description="Filter by author (ex. ?author=Test)",
+                description=(
+                    "Search by author, results are ranked "
+                    "(ex. ?author=Test)"
+                ),
             ),
             OpenApiParameter(
                 "cover",
                 type=str,
-                description="Filter by cover (ex. ?cover=Hard or Soft)",
+                description=(
+                    "Filter by exact cover, case-insensitive "
+                    "(ex. ?cover=Hard or Soft)"
+                ),
+            ),
+            OpenApiParameter(
+                "ids",
+                type={"type": "list", "items": {"type": "number"}},
+                description=(
+                    f"Get up to {MAX_BOOK_IDS} books at once, unpaginated "
+                    "(ex. ?ids=1,2,3)"
+                ),
+            ),
+            OpenApiParameter(
+                "fields",
+                type=str,
+                description="Only return these fields (ex. ?fields=id,title)",
+            ),
+            OpenApiParameter(
+                "omit",
+                type=str,
+                description="Leave these fields out (ex. ?omit=inventory)",
             ),
         ]
     )
     def list(self, request, *args, **kwargs):
-        return super().list(request, *args, **kwargs)
+        etag, last_modified = list_validators(request)
+        return conditional_response(
+            request,
+            etag,
+            last_modified,
+            partial(
+                cached_response,
+                request,
+                partial(super().list, request, *args, **kwargs),
+            ),
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        etag, last_modified = detail_validators(request, kwargs["pk"])
+        return conditional_response(
+            request,
+            etag,
+            last_modified,
+            partial(
+                cached_response,
+                request,
+                partial(super().retrieve, request, *args, **kwargs),
+            ),
+        )
+
+    @extend_schema(
+        parameters=[EXPORT_FORMAT_PARAMETER], responses=EXPORT_RESPONSES
+    )
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Stream the filtered catalog as NDJSON or CSV"""
+        return export_response(
+            request,
+            self.filter_queryset(self.get_queryset()),
+            ValuesRepresentation(self.get_serializer()),
+            "books",
+        )
+
+    @extend_schema(
+        request={
+            "multipart/form-data": {
+                "type": "object",
+                "properties": {
+                    "file": {"type": "string", "format": "binary"},
+                    "import_format": {
+                        "type": "string", "enum": IMPORT_FORMATS
+                    },
+                },
+                "required": ["file"],
+            }
+        },
+        responses=OpenApiTypes.OBJECT,
+    )
+    @action(
+        detail=False,
+        methods=["post"],
+        url_path="import",
+        permission_classes=[IsAdminUser],
+        parser_classes=[MultiPartParser],
+    )
+    def import_books(self, request):
+        """Create or update books from a CSV or JSON Lines file"""
+        upload = request.FILES.get("file")
+        if upload is None:
+            raise ValidationError({"file": "This field is required."})
+        import_format = request.data.get(
+            "import_format", guess_import_format(upload.name)
+        )
+        if import_format not in IMPORT_FORMATS:
+            raise ValidationError({"import_format": "Must be csv or jsonl"})
+
+        return Response(BookImport().run(upload.file, import_format))
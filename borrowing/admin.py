@@ -1,6 +1,8 @@
 from django.contrib import admin
 
-from borrowing.models import Borrowing
+from borrowing.models import Borrowing, OutboxMessage, OverdueSweep
 
 
 admin.site.register(Borrowing)
+admin.site.register(OutboxMessage)
+admin.site.register(OverdueSweep)
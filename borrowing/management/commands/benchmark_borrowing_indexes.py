@@ -0,0 +1,99 @@
+import statistics
+import time
+
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, transaction
+
+from borrowing.models import Borrowing
+from borrowing.overdue import overdue_queryset
+
+
+PAGE_SIZE = 100
+
+
+class Command(BaseCommand):
+    """
+    Django command to show query plans and latency of the
+    BorrowingViewSet and overdue sweep query patterns, with and
+    without the Borrowing indexes.
+
+    The "without" pass drops the indexes inside a transaction that is
+    rolled back afterwards; on PostgreSQL that holds an exclusive lock on
+    the table meanwhile, so run it against a benchmark database
+    (see the seed_library command).
+    """
+
+    help = "Benchmark Borrowing query patterns with and without indexes"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--repeat", type=int, default=20)
+        parser.add_argument(
+            "--plans", action="store_true", help="Print the query plans"
+        )
+
+    def scenarios(self):
+        latest = Borrowing.objects.order_by("-id").first()
+        if latest is None:
+            raise CommandError("No borrowings, seed the database first")
+        user_id, book_id = latest.user_id, latest.book_id
+        return {
+            "staff list": Borrowing.objects.all(),
+            "user list": Borrowing.objects.filter(user_id=user_id),
+            "user list, active": Borrowing.objects.filter(
+                user_id=user_id, actual_return_date__isnull=True
+            ),
+            "staff ?user_id=a,b": Borrowing.objects.filter(
+                user_id__in=[user_id, user_id + 1]
+            ),
+            "staff ?is_active=true": Borrowing.objects.filter(
+                actual_return_date__isnull=True
+            ),
+            "book_id lookup": Borrowing.objects.filter(book_id=book_id),
+            "overdue sweep": overdue_queryset(),
+        }
+
+    def measure(self, scenarios, repeat, plans):
+        results = {}
+        for name, queryset in scenarios.items():
+            timings = []
+            for _ in range(repeat):
+                started = time.perf_counter()
+                list(queryset.all()[:PAGE_SIZE])
+                timings.append((time.perf_counter() - started) * 1000)
+            results[name] = statistics.median(timings)
+            if plans:
+                explain = queryset[:PAGE_SIZE].explain()
+                self.stdout.write(f"-- {name}\n{explain}\n")
+        return results
+
+    def handle(self, *args, **options):
+        repeat, plans = options["repeat"], options["plans"]
+        scenarios = self.scenarios()
+        self.stdout.write(
+            f"Borrowings: {Borrowing.objects.count()}, "
+            f"database: {connection.vendor}"
+        )
+
+        self.stdout.write("With indexes:")
+        indexed = self.measure(scenarios, repeat, plans)
+
+        self.stdout.write("Without indexes:")
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                for index in Borrowing._meta.indexes:
+                    cursor.execute(
+                        f"DROP INDEX {connection.ops.quote_name(index.name)}"
+                    )
+            unindexed = self.measure(scenarios, repeat, plans)
+            transaction.set_rollback(True)
+
+        self.stdout.write(
+            f"{'scenario':<24}{'without, ms':>14}{'with, ms':>12}"
+            f"{'speedup':>10}"
+        )
+        for name in scenarios:
+            speedup = unindexed[name] / max(indexed[name], 1e-6)
+            self.stdout.write(
+                f"{name:<24}{unindexed[name]:>14.2f}{indexed[name]:>12.2f}"
+                f"{speedup:>9.1f}x"
+            )
@@ -0,0 +1,15 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0003_alter_borrowing_actual_return_date"),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name="borrowing",
+            options={"ordering": ["-borrow_date", "-id"]},
+        ),
+    ]
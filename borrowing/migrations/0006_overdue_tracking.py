@@ -0,0 +1,49 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0005_outboxmessage"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="OverdueSweep",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("threshold", models.DateField()),
+                ("rows", models.PositiveIntegerField(default=0)),
+                ("finished_at", models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                "ordering": ["-threshold", "-id"],
+            },
+        ),
+        migrations.AddField(
+            model_name="borrowing",
+            name="overdue_notified_at",
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(
+                    ("actual_return_date__isnull", True),
+                    ("overdue_notified_at__isnull", False),
+                ),
+                fields=["overdue_notified_at"],
+                name="borrowing_overdue_remind_idx",
+            ),
+        ),
+    ]
@@ -0,0 +1,38 @@
+# Generated by Django 4.1.5 on 2026-10-18 17:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("borrowing", "0006_overdue_tracking"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["-borrow_date", "-id"], name="borrowing_borrow_date_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                fields=["user_id", "-borrow_date", "-id"],
+                name="borrowing_user_date_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(
+                condition=models.Q(("actual_return_date__isnull", True)),
+                fields=["expected_return_date"],
+                name="borrowing_active_expected_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="borrowing",
+            index=models.Index(fields=["book_id"], name="borrowing_book_id_idx"),
+        ),
+    ]
@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import Q
+from django.utils import timezone
 
 
 class Borrowing(models.Model):
@@ -7,6 +9,8 @@ class Borrowing(models.Model):
     actual_return_date = models.DateField(null=True)
     book_id = models.IntegerField()
     user_id = models.IntegerField()
+    # Last overdue notification, set by incremental overdue sweeps
+    overdue_notified_at = models.DateTimeField(null=True, blank=True)
 
     @property
     def is_active(self):
@@ -23,4 +27,79 @@ class Borrowing(models.Model):
         )
 
     class Meta:
-        ordering = ["-borrow_date"]
+        ordering = ["-borrow_date", "-id"]
+        indexes = [
+            # Staff list and keyset pagination order
+            models.Index(
+                fields=["-borrow_date", "-id"],
+                name="borrowing_borrow_date_idx",
+            ),
+            # Non-staff list and ?user_id= filter, in list order
+            models.Index(
+                fields=["user_id", "-borrow_date", "-id"],
+                name="borrowing_user_date_idx",
+            ),
+            # Overdue sweeps and ?is_active=true
+            models.Index(
+                fields=["expected_return_date"],
+                condition=Q(actual_return_date__isnull=True),
+                name="borrowing_active_expected_idx",
+            ),
+            models.Index(fields=["book_id"], name="borrowing_book_id_idx"),
+            models.Index(
+                fields=["overdue_notified_at"],
+                condition=Q(
+                    actual_return_date__isnull=True,
+                    overdue_notified_at__isnull=False,
+                ),
+                name="borrowing_overdue_remind_idx",
+            ),
+        ]
+
+
+class OutboxMessage(models.Model):
+    """Notification waiting to be delivered by the outbox Celery task"""
+
+    class StatusChoices(models.TextChoices):
+        PENDING = "Pending"
+        SENT = "Sent"
+        FAILED = "Failed"
+
+    message = models.TextField()
+    status = models.CharField(
+        max_length=7,
+        choices=StatusChoices.choices,
+        default=StatusChoices.PENDING,
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True)
+
+    def __str__(self):
+        return f"Outbox message id: {self.id}, status: {self.status}"
+
+    class Meta:
+        ordering = ["id"]
+        indexes = [
+            models.Index(
+                fields=["next_attempt_at"],
+                condition=Q(status="Pending"),
+                name="outbox_pending_idx",
+            ),
+        ]
+
+
+class OverdueSweep(models.Model):
+    """Watermark of an incremental overdue borrowings run"""
+
+    threshold = models.DateField()
+    rows = models.PositiveIntegerField(default=0)
+    finished_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Overdue sweep: {self.threshold}, rows: {self.rows}"
+
+    class Meta:
+        ordering = ["-threshold", "-id"]
@@ -0,0 +1,93 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from borrowing.models import OutboxMessage
+
+from library_service.notification import notification
+
+
+def enqueue_notification(message: str):
+    """
+    Store a notification in the outbox.
+
+    Call it inside the transaction of the change being announced: the
+    message is delivered by the `deliver_notifications` task only if that
+    transaction commits, and the request never waits for the notifier.
+    Messages over NOTIFICATION_MESSAGE_LIMIT are truncated.
+    """
+    limit = settings.NOTIFICATION_MESSAGE_LIMIT
+    if len(message) > limit:
+        message = message[:limit - 3] + "..."
+    return OutboxMessage.objects.create(message=message)
+
+
+def retry_delay(attempts):
+    delay = settings.NOTIFICATION_OUTBOX_RETRY_DELAY * 2 ** (attempts - 1)
+    return timedelta(
+        seconds=min(delay, settings.NOTIFICATION_OUTBOX_MAX_RETRY_DELAY)
+    )
+
+
+def _deliver(message, now):
+    try:
+        notification(message.message)
+    except Exception as error:
+        message.attempts += 1
+        message.last_error = repr(error)
+        if message.attempts >= settings.NOTIFICATION_OUTBOX_MAX_ATTEMPTS:
+            message.status = OutboxMessage.StatusChoices.FAILED
+        else:
+            message.next_attempt_at = now + retry_delay(message.attempts)
+        return False
+
+    message.attempts += 1
+    message.status = OutboxMessage.StatusChoices.SENT
+    message.sent_at = now
+    return True
+
+
+def deliver_pending(batch_size=None):
+    """
+    Deliver due outbox messages in batches of `batch_size`.
+
+    Batches are claimed with SELECT ... FOR UPDATE SKIP LOCKED, so
+    several workers can drain the outbox at once. Failed deliveries are
+    retried with exponential backoff until the attempts run out.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_OUTBOX_BATCH_SIZE
+    stats = {"sent": 0, "retried": 0, "failed": 0}
+
+    while True:
+        with transaction.atomic():
+            now = timezone.now()
+            batch = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(
+                    status=OutboxMessage.StatusChoices.PENDING,
+                    next_attempt_at__lte=now,
+                )
+                .order_by("id")[:batch_size]
+            )
+            for message in batch:
+                if _deliver(message, now):
+                    stats["sent"] += 1
+                elif message.status == OutboxMessage.StatusChoices.FAILED:
+                    stats["failed"] += 1
+                else:
+                    stats["retried"] += 1
+            OutboxMessage.objects.bulk_update(
+                batch,
+                (
+                    "status",
+                    "attempts",
+                    "next_attempt_at",
+                    "last_error",
+                    "sent_at",
+                ),
+            )
+
+        if len(batch) < batch_size:
+            return stats
@@ -0,0 +1,370 @@
+import logging
+import time
+from collections import defaultdict
+from datetime import date, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+from book.models import Book
+from borrowing.models import Borrowing, OverdueSweep
+from user.models import User
+
+from library_service.notification import notification
+
+
+logger = logging.getLogger(__name__)
+
+NO_OVERDUE_MESSAGE = "No borrowings overdue today!"
+DIGEST_GROUPINGS = ("user", "book")
+
+
+class QueryCounter:
+    """Count the queries run on the default connection"""
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self._wrapper = connection.execute_wrapper(self)
+        self._wrapper.__enter__()
+        return self
+
+    def __exit__(self, *exc_info):
+        return self._wrapper.__exit__(*exc_info)
+
+
+def incremental_window(now=None):
+    """
+    Limits of an incremental run: the threshold date of the last sweep
+    and the cutoff before which notified borrowings are reminded again.
+    """
+    now = now or timezone.now()
+    # The latest sweep, its threshold may be lower than an earlier one's
+    last_sweep = OverdueSweep.objects.order_by("-id").first()
+    interval = settings.OVERDUE_REMINDER_INTERVAL_DAYS
+    return {
+        "since": last_sweep.threshold.isoformat() if last_sweep else None,
+        "remind_before": (
+            (now - timedelta(days=interval)).isoformat() if interval else None
+        ),
+    }
+
+
+def overdue_queryset(today=None, window=None):
+    """
+    Active borrowings overdue on `today`.
+
+    With an `incremental_window` only borrowings that became overdue
+    since the last sweep and were not notified yet are returned, plus
+    the ones due for a reminder.
+    """
+    queryset = Borrowing.objects.filter(
+        expected_return_date__lt=today or date.today(),
+        actual_return_date__isnull=True,
+    )
+    if window is not None:
+        condition = Q(overdue_notified_at__isnull=True)
+        if window["since"]:
+            condition &= Q(expected_return_date__gte=window["since"])
+        if window["remind_before"]:
+            condition |= Q(overdue_notified_at__lte=window["remind_before"])
+        queryset = queryset.filter(condition)
+    return queryset.order_by("id")
+
+
+def record_sweep(today, stats):
+    """
+    Record a run, its threshold held back to the earliest borrowing left
+    out of a digest, so the next run lists it
+    """
+    threshold = today
+    if stats.get("pending_since"):
+        threshold = min(today, date.fromisoformat(stats["pending_since"]))
+    return OverdueSweep.objects.create(threshold=threshold, rows=stats["rows"])
+
+
+def partition_ids(queryset, size):
+    """
+    Split the ids of `queryset` into (first_id, last_id) ranges of
+    `size` rows each, so gaps in the ids leave no range empty
+    """
+    ids = queryset.values_list("id", flat=True).iterator(chunk_size=size)
+    return [
+        (chunk[0], chunk[-1])
+        for chunk in iter(lambda: list(islice(ids, size)), [])
+    ]
+
+
+def iter_chunks(queryset, chunk_size):
+    """Stream a queryset as lists of at most `chunk_size` rows"""
+    rows = queryset.iterator(chunk_size=chunk_size)
+    while chunk := list(islice(rows, chunk_size)):
+        yield chunk
+
+
+def resolve_chunk(chunk):
+    """Fetch the books and users of a chunk of borrowings, two queries"""
+    books = Book.objects.only("title").in_bulk(
+        {borrowing.book_id for borrowing in chunk}
+    )
+    users = User.objects.only("email").in_bulk(
+        {borrowing.user_id for borrowing in chunk}
+    )
+    return books, users
+
+
+def overdue_message(borrowing, book, user):
+    return f"Overdue borrowing:\n" \
+           f"id: {borrowing.id}\n" \
+           f"Borrow date: {borrowing.borrow_date}\n" \
+           f"Expected return date: " \
+           f"{borrowing.expected_return_date}\n" \
+           f"Book id: {borrowing.book_id}, " \
+           f"Title: {book.title if book else None}\n" \
+           f"User id: {borrowing.user_id}, " \
+           f"email: {user.email if user else None}"
+
+
+class OverdueDigest:
+    """
+    Overdue borrowings grouped by user or by book, packed into at most
+    `max_messages` messages of at most `limit` characters each.
+
+    `entries` exports the borrowings added so far as JSON-serializable
+    lists and `extend` adds them back, so the ranges of a fanned out
+    run can be merged into one digest.
+    """
+
+    def __init__(self, group_by, limit, max_messages):
+        if group_by not in DIGEST_GROUPINGS:
+            raise ValueError(f"Unknown digest grouping: {group_by}")
+        self.group_by = group_by
+        self.limit = limit
+        self.max_messages = max_messages
+        self.groups = defaultdict(list)
+        self.headers = {}
+        self.expected = {}
+        self.total = 0
+
+    def add(self, borrowing, book, user):
+        title = book.title if book else None
+        email = user.email if user else None
+        if self.group_by == "user":
+            key = borrowing.user_id
+            header = f"User id: {borrowing.user_id}, email: {email}"
+            line = f"- id: {borrowing.id}, book id: {borrowing.book_id}, " \
+                   f"title: {title}, " \
+                   f"expected: {borrowing.expected_return_date}"
+        else:
+            key = borrowing.book_id
+            header = f"Book id: {borrowing.book_id}, title: {title}"
+            line = f"- id: {borrowing.id}, user id: {borrowing.user_id}, " \
+                   f"email: {email}, " \
+                   f"expected: {borrowing.expected_return_date}"
+        self._add(
+            key, header, line, borrowing.id, borrowing.expected_return_date
+        )
+
+    def _add(self, key, header, line, borrowing_id, expected):
+        self.headers.setdefault(key, header)
+        self.groups[key].append((line, borrowing_id))
+        self.expected[borrowing_id] = expected
+        self.total += 1
+
+    def entries(self):
+        return [
+            [
+                key,
+                self.headers[key],
+                line,
+                borrowing_id,
+                self.expected[borrowing_id].isoformat(),
+            ]
+            for key, items in self.groups.items()
+            for line, borrowing_id in items
+        ]
+
+    def extend(self, entries):
+        for key, header, line, borrowing_id, expected in entries:
+            self._add(
+                key, header, line, borrowing_id, date.fromisoformat(expected)
+            )
+
+    def _lines(self):
+        for key, items in self.groups.items():
+            yield self.headers[key], None
+            yield from items
+
+    def pending_since(self, listed):
+        """Earliest expected return date of the borrowings not `listed`"""
+        listed = set(listed)
+        return min(
+            (
+                expected
+                for borrowing_id, expected in self.expected.items()
+                if borrowing_id not in listed
+            ),
+            default=None,
+        )
+
+    def messages(self):
+        """The messages, and the ids of the borrowings listed in them"""
+        title = f"Overdue borrowings: {self.total}"
+        more = "... and {} more"
+        # Keep room for the "... and N more" line in the last message.
+        last_limit = self.limit - len(more.format(self.total)) - 1
+
+        def fits(current, line):
+            last = len(messages) + 1 == self.max_messages
+            size = sum(len(text) + 1 for text in current) + len(line)
+            return size <= (last_limit if last else self.limit)
+
+        messages, current, listed = [], [title], []
+        for line, borrowing_id in self._lines():
+            line = line[:last_limit - len(title) - 1]
+            if not fits(current, line):
+                if len(messages) + 1 == self.max_messages:
+                    break
+                messages.append("\n".join(current))
+                current = [title]
+            current.append(line)
+            if borrowing_id is not None:
+                listed.append(borrowing_id)
+
+        if len(listed) < self.total:
+            current.append(more.format(self.total - len(listed)))
+        messages.append("\n".join(current))
+        return messages, listed
+
+
+def mark_notified(chunks):
+    now = timezone.now()
+    for ids in chunks:
+        Borrowing.objects.filter(id__in=ids).update(overdue_notified_at=now)
+
+
+def send_digest(digest, incremental=False):
+    """
+    Send the messages of `digest`. Returns how many were sent and the
+    earliest expected return date of the borrowings left out.
+    """
+    messages, listed = digest.messages()
+    for message in messages:
+        notification(message)
+    # The rows only counted in "... and N more" stay unstamped and come
+    # up again in the next incremental sweep
+    if incremental:
+        mark_notified([listed])
+    return len(messages), digest.pending_since(listed)
+
+
+def process_overdue(
+    queryset,
+    chunk_size=None,
+    group_by=None,
+    notify_empty=True,
+    incremental=False,
+    collect_digest=False,
+):
+    """
+    Notify about every overdue borrowing of `queryset`.
+
+    Rows are streamed in chunks; books and users are resolved with one
+    bulk query per chunk instead of two queries per row. With `group_by`
+    ("user" or "book") one digest of a few size-limited messages is sent
+    instead of a message per borrowing, unless nothing was found.
+    `notify_empty=False` skips the "nothing overdue" message,
+    `incremental=True` stamps the notified borrowings with
+    `overdue_notified_at`. Returns the number of rows, queries and
+    messages, the elapsed seconds of the run and the earliest expected
+    return date of the borrowings a digest left out. With
+    `collect_digest=True` the digest is not sent but returned as its
+    `entries` under "digest", for `merge_results` to send.
+    """
+    chunk_size = chunk_size or settings.OVERDUE_CHUNK_SIZE
+    digest = group_by and OverdueDigest(
+        group_by,
+        settings.NOTIFICATION_MESSAGE_LIMIT,
+        settings.OVERDUE_DIGEST_MAX_MESSAGES,
+    )
+    started = time.monotonic()
+    rows = messages = 0
+    pending_since = None
+
+    with QueryCounter() as queries:
+        for chunk in iter_chunks(queryset, chunk_size):
+            books, users = resolve_chunk(chunk)
+            for borrowing in chunk:
+                book = books.get(borrowing.book_id)
+                user = users.get(borrowing.user_id)
+                if digest:
+                    digest.add(borrowing, book, user)
+                else:
+                    notification(overdue_message(borrowing, book, user))
+                    messages += 1
+            rows += len(chunk)
+            if incremental and not digest:
+                mark_notified([[borrowing.id for borrowing in chunk]])
+
+        if not rows and notify_empty:
+            notification(NO_OVERDUE_MESSAGE)
+            messages += 1
+        elif digest and rows and not collect_digest:
+            messages, pending_since = send_digest(digest, incremental)
+
+    stats = {
+        "rows": rows,
+        "queries": queries.count,
+        "messages": messages,
+        "elapsed": round(time.monotonic() - started, 3),
+        "pending_since": pending_since and pending_since.isoformat(),
+    }
+    if digest and collect_digest:
+        stats["digest"] = digest.entries()
+    logger.info("Overdue borrowings processed: %s", stats)
+    return stats
+
+
+def merge_results(results, group_by=None, incremental=False):
+    """
+    Merge the stats of the chunks of a fanned out run, and send the
+    digest entries they collected as one digest grouped by `group_by`
+    """
+    summary = {
+        "chunks": len(results),
+        "rows": sum(result["rows"] for result in results),
+        "queries": sum(result["queries"] for result in results),
+        "messages": sum(result["messages"] for result in results),
+        "elapsed": max((result["elapsed"] for result in results), default=0),
+        "pending_since": min(
+            filter(None, (result.get("pending_since") for result in results)),
+            default=None,
+        ),
+    }
+    if not summary["rows"]:
+        notification(NO_OVERDUE_MESSAGE)
+        summary["messages"] += 1
+    elif group_by:
+        digest = OverdueDigest(
+            group_by,
+            settings.NOTIFICATION_MESSAGE_LIMIT,
+            settings.OVERDUE_DIGEST_MAX_MESSAGES,
+        )
+        for result in results:
+            digest.extend(result.get("digest", []))
+        if digest.total:
+            messages, pending_since = send_digest(digest, incremental)
+            summary["messages"] += messages
+            summary["pending_since"] = (
+                pending_since and pending_since.isoformat()
+            )
+    logger.info("Overdue borrowings fan-out merged: %s", summary)
+    return summary
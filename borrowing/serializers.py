@@ -1,33 +1,41 @@
+from collections import Counter
 from datetime import date
 
-from django.core.exceptions import ValidationError
+from django.db import transaction
 from rest_framework import serializers
 
+from book.inventory import return_book, return_books, take_book, take_books
 from book.models import Book
+from book.serializers import BookListSerializer
 from borrowing.models import Borrowing
-
-from library_service.notification import notification
+from borrowing.outbox import enqueue_notification
+from library_service.fields import SparseFieldsSerializerMixin
 
 
 class BorrowingSerializer(serializers.ModelSerializer):
-    def validate(self, attrs):
-        data = super(BorrowingSerializer, self).validate(attrs)
-        queryset = Book.objects.get(id=attrs["book_id"])
-        queryset.inventory -= 1
-        if queryset.inventory >= 0:
-            queryset.save()
+    def create(self, validated_data):
+        book_id = validated_data["book_id"]
+        title = Book.objects.filter(id=book_id).values_list(
+            "title", flat=True
+        ).first()
+        with transaction.atomic():
+            borrowing = super(BorrowingSerializer, self).create(
+                validated_data
+            )
             message = f"New borrowing:\n" \
                       f"Borrow date: {date.today()}\n" \
                       f"Expected return date: " \
-                      f"{attrs['expected_return_date']}\n" \
-                      f"Book id: {attrs['book_id']}, " \
-                      f"title: {queryset.title}\n" \
+                      f"{borrowing.expected_return_date}\n" \
+                      f"Book id: {book_id}, " \
+                      f"title: {title}\n" \
                       f"User id: {self.context['request'].user.id}, " \
                       f"email: {self.context['request'].user}"
-            notification(message)
-            return data
-        else:
-            raise ValidationError("Book not available")
+            enqueue_notification(message)
+            # Last, the book row stays locked until the commit
+            if not take_book(book_id):
+                raise serializers.ValidationError("Book not available")
+
+        return borrowing
 
     class Meta:
         model = Borrowing
@@ -42,7 +50,16 @@ class BorrowingSerializer(serializers.ModelSerializer):
         read_only_fields = ("id", "actual_return_date", "user_id")
 
 
-class BorrowingListSerializer(serializers.ModelSerializer):
+class BorrowingListSerializer(
+    SparseFieldsSerializerMixin, serializers.ModelSerializer
+):
+    def to_representation(self, instance):
+        data = super().to_representation(instance)
+        books = self.context.get("books")
+        if books is not None:
+            book = books.get(instance.book_id)
+            data["book"] = BookListSerializer(book).data if book else None
+        return data
 
     class Meta:
         model = Borrowing
@@ -59,29 +76,60 @@ class BorrowingListSerializer(serializers.ModelSerializer):
             "id",
             "actual_return_date",
         )
+        sparse_sources = {"is_active": ("actual_return_date",)}
+        value_converters = {
+            "is_active": lambda row: row["actual_return_date"] is None,
+        }
 
 
 class BorrowingDetailSerializer(serializers.ModelSerializer):
-    def validate(self, attrs):
-        data = super(BorrowingDetailSerializer, self).validate(attrs)
-        if attrs["actual_return_date"] is not None:
-            book_id = self.instance.book_id
-            queryset = Book.objects.get(id=book_id)
-            queryset.inventory += 1
-            queryset.save()
-            message = f"Borrowing complete: id: {self.instance.pk}\n" \
+    def update(self, instance, validated_data):
+        actual_return_date = validated_data.get("actual_return_date")
+        if (
+            "actual_return_date" in validated_data
+            and actual_return_date is None
+            and instance.actual_return_date is not None
+        ):
+            # Reopening would keep the copy that went back to inventory
+            raise serializers.ValidationError(
+                {"actual_return_date": "A returned borrowing can not be "
+                                       "reopened"}
+            )
+        if actual_return_date is None:
+            return super(BorrowingDetailSerializer, self).update(
+                instance, validated_data
+            )
+
+        title = Book.objects.filter(id=instance.book_id).values_list(
+            "title", flat=True
+        ).first()
+        with transaction.atomic():
+            returned = Borrowing.objects.filter(
+                pk=instance.pk, actual_return_date__isnull=True
+            ).update(**validated_data)
+            if not returned:
+                raise serializers.ValidationError(
+                    "Borrowing already returned"
+                )
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+
+            message = f"Borrowing complete: id: {instance.pk}\n" \
                       f"Borrow date: " \
-                      f"{self.instance.borrow_date}\n" \
+                      f"{instance.borrow_date}\n" \
                       f"Expected return date: " \
-                      f"{self.initial_data['expected_return_date']}\n" \
+                      f"{instance.expected_return_date}\n" \
                       f"Actual return date: " \
-                      f"{self.initial_data['actual_return_date']}\n" \
-                      f"Book id: {book_id}, " \
-                      f"title: {queryset.title}\n" \
+                      f"{instance.actual_return_date}\n" \
+                      f"Book id: {instance.book_id}, " \
+                      f"title: {title}\n" \
                       f"User id: {self.context['request'].user.id}, " \
                       f"email: {self.context['request'].user}"
-            notification(message)
-            return data
+            enqueue_notification(message)
+            # Last, the book row stays locked until the commit
+            return_book(instance.book_id)
+
+        return instance
 
     class Meta:
         model = Borrowing
@@ -95,3 +143,89 @@ class BorrowingDetailSerializer(serializers.ModelSerializer):
             "is_active",
         )
         read_only_fields = ("id", "book_id", "user_id")
+
+
+def _books_lines(book_ids):
+    titles = dict(
+        Book.objects.filter(id__in=set(book_ids)).values_list("id", "title")
+    )
+    return "".join(
+        f"\n- Book id: {book_id}, title: {titles.get(book_id)}"
+        for book_id in book_ids
+    )
+
+
+class BorrowingBulkCreateSerializer(serializers.Serializer):
+    book_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=50
+    )
+    expected_return_date = serializers.DateField()
+
+    def create(self, validated_data):
+        book_ids = validated_data["book_ids"]
+        user = self.context["request"].user
+        books_lines = _books_lines(book_ids)
+        with transaction.atomic():
+            borrowings = Borrowing.objects.bulk_create(
+                Borrowing(
+                    expected_return_date=(
+                        validated_data["expected_return_date"]
+                    ),
+                    book_id=book_id,
+                    user_id=user.id,
+                )
+                for book_id in book_ids
+            )
+
+            message = f"New borrowings: {len(borrowings)}\n" \
+                      f"Borrow date: {date.today()}\n" \
+                      f"Expected return date: " \
+                      f"{validated_data['expected_return_date']}\n" \
+                      f"User id: {user.id}, " \
+                      f"email: {user}" \
+                      f"{books_lines}"
+            enqueue_notification(message)
+            # Last, the book rows stay locked until the commit
+            if not take_books(Counter(book_ids)):
+                raise serializers.ValidationError("Books not available")
+
+        return borrowings
+
+
+class BorrowingBulkReturnSerializer(serializers.Serializer):
+    borrowing_ids = serializers.ListField(
+        child=serializers.IntegerField(), allow_empty=False, max_length=50
+    )
+    actual_return_date = serializers.DateField()
+
+    def create(self, validated_data):
+        borrowing_ids = set(validated_data["borrowing_ids"])
+        user = self.context["request"].user
+        with transaction.atomic():
+            active = validated_data["queryset"].filter(
+                id__in=borrowing_ids, actual_return_date__isnull=True
+            )
+            book_ids = list(
+                active.select_for_update().values_list("book_id", flat=True)
+            )
+            returned = active.update(
+                actual_return_date=validated_data["actual_return_date"]
+            )
+            if returned != len(borrowing_ids):
+                raise serializers.ValidationError(
+                    "Borrowings not found or already returned"
+                )
+
+            message = f"Borrowings complete: {returned}\n" \
+                      f"Actual return date: " \
+                      f"{validated_data['actual_return_date']}\n" \
+                      f"Borrowing ids: " \
+                      f"{', '.join(map(str, sorted(borrowing_ids)))}\n" \
+                      f"User id: {user.id}, " \
+                      f"email: {user}" \
+                      f"{_books_lines(book_ids)}"
+            enqueue_notification(message)
+            # Last, the book rows stay locked until the commit
+            return_books(Counter(book_ids))
+
+        return list(Borrowing.objects.filter(id__in=borrowing_ids))
@@ -1,33 +1,93 @@
 from datetime import date
 
-from celery import shared_task
-from django.db.models import Q
+from celery import chord, shared_task
+from django.conf import settings
 
-from borrowing.models import Borrowing
-from book.models import Book
-from user.models import User
+from borrowing.outbox import deliver_pending
+from borrowing.overdue import (
+    incremental_window,
+    merge_results,
+    overdue_queryset,
+    partition_ids,
+    process_overdue,
+    record_sweep,
+)
 
-from library_service.notification import notification
+
+@shared_task()
+def overdue_borrowings(group_by=None, fan_out=None, incremental=None):
+    """
+    Notify about overdue borrowings.
+
+    With `incremental` (default settings.OVERDUE_INCREMENTAL) only
+    borrowings that became overdue since the last sweep, or are due for a
+    reminder, are processed. With `fan_out` (default
+    settings.OVERDUE_FAN_OUT) this task only coordinates: it splits the
+    overdue borrowings into id ranges of
+    settings.OVERDUE_FAN_OUT_CHUNK_SIZE rows and runs them as a chord of
+    `overdue_borrowings_range` tasks across the workers, merged by
+    `merge_overdue_results`. A digest is then collected by the ranges
+    and sent once by `merge_overdue_results`.
+    """
+    group_by = group_by or settings.OVERDUE_DIGEST_GROUP_BY
+    if fan_out is None:
+        fan_out = settings.OVERDUE_FAN_OUT
+    if incremental is None:
+        incremental = settings.OVERDUE_INCREMENTAL
+
+    today = date.today()
+    window = incremental_window() if incremental else None
+    queryset = overdue_queryset(today, window)
+
+    if not fan_out:
+        stats = process_overdue(
+            queryset, group_by=group_by, incremental=incremental
+        )
+        if incremental:
+            record_sweep(today, stats)
+        return stats
+
+    ranges = partition_ids(queryset, settings.OVERDUE_FAN_OUT_CHUNK_SIZE)
+    if not ranges:
+        return merge_overdue_results(
+            [], today.isoformat(), incremental, group_by
+        )
+
+    result = chord(
+        overdue_borrowings_range.s(
+            first, last, today.isoformat(), group_by, window
+        )
+        for first, last in ranges
+    )(merge_overdue_results.s(today.isoformat(), incremental, group_by))
+    return {"chunks": len(ranges), "summary_task_id": result.id}
 
 
 @shared_task()
-def overdue_borrowings():
-    queryset = Borrowing.objects.all().filter(
-        Q(expected_return_date__lt=date.today()) & Q(actual_return_date=None)
+def overdue_borrowings_range(
+    first_id, last_id, today, group_by=None, window=None
+):
+    queryset = overdue_queryset(date.fromisoformat(today), window).filter(
+        id__range=(first_id, last_id)
     )
-    if queryset.exists():
-        for borrowing in queryset:
-            book = Book.objects.get(id=borrowing.book_id)
-            user = User.objects.get(id=borrowing.user_id)
-            message = f"Overdue borrowing:\n" \
-                      f"id: {borrowing.id}\n" \
-                      f"Borrow date: {borrowing.borrow_date}\n" \
-                      f"Expected return date: " \
-                      f"{borrowing.expected_return_date}\n" \
-                      f"Book id: {borrowing.book_id}, " \
-                      f"Title: {book.title}\n" \
-                      f"User id: {borrowing.user_id}, " \
-                      f"email: {user.email}"
-            notification(message)
-    else:
-        notification(message="No borrowings overdue today!")
+    return process_overdue(
+        queryset,
+        group_by=group_by,
+        notify_empty=False,
+        incremental=window is not None,
+        collect_digest=True,
+    )
+
+
+@shared_task()
+def merge_overdue_results(
+    results, today=None, incremental=False, group_by=None
+):
+    summary = merge_results(results, group_by, incremental)
+    if incremental:
+        record_sweep(date.fromisoformat(today), summary)
+    return summary
+
+
+@shared_task()
+def deliver_notifications():
+    return deliver_pending()
@@ -1,21 +1,34 @@
+import base64
 import datetime
+import json
+import threading
+import time
 from datetime import date
 
+from asgiref.sync import async_to_sync
 from django.contrib.auth import get_user_model
-from django.test import TestCase
+from django.db import connection, OperationalError
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 
 from rest_framework.test import APIClient
 from rest_framework import status
+from rest_framework_simplejwt.tokens import AccessToken
 
-from borrowing.models import Borrowing
+from borrowing.models import Borrowing, OutboxMessage
 from book.tests.test_book_api import sample_book
+from book.serializers import BookListSerializer
 from borrowing.serializers import (
     BorrowingListSerializer,
     BorrowingDetailSerializer
 )
 
 BORROWING_URL = reverse("borrowing:borrowing-list")
+BULK_URL = reverse("borrowing:borrowing-bulk")
+BULK_RETURN_URL = reverse("borrowing:borrowing-bulk-return")
+EXPORT_URL = reverse("borrowing:borrowing-export")
+ASYNC_BORROWING_URL = reverse("borrowing:borrowing-list-async")
 
 
 def sample_borrowing(**kwargs):
@@ -31,6 +44,7 @@ def detail_url(borrowing_id):
     return reverse("borrowing:borrowing-detail", args=[borrowing_id])
 
 
+@override_settings(DATABASE_REPLICAS=[])
 class UnauthenticatedBookApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -50,6 +64,7 @@ class UnauthenticatedBookApiTests(TestCase):
         self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
 
 
+@override_settings(DATABASE_REPLICAS=[])
 class AuthenticatedBookApiTests(TestCase):
     def setUp(self):
         self.client = APIClient()
@@ -108,6 +123,161 @@ class AuthenticatedBookApiTests(TestCase):
         self.assertIn(serializer2.data, res_with_filter.data["results"])
         self.assertNotIn(serializer1.data, res_with_filter.data["results"])
 
+    def test_list_borrowing_cursor_pagination_breaks_date_ties_by_id(self):
+        self.client.force_authenticate(self.admin)
+        borrowings = [
+            sample_borrowing(user_id=self.user_1.id) for _ in range(6)
+        ]
+        borrowings += [
+            sample_borrowing(user_id=self.user_2.id) for _ in range(6)
+        ]
+        Borrowing.objects.filter(
+            id__in=[borrowing.id for borrowing in borrowings[:6]]
+        ).update(borrow_date=date.today() - datetime.timedelta(days=3))
+
+        ids = []
+        url, params = BORROWING_URL, {"pagination": "cursor"}
+        while url:
+            res = self.client.get(url, params)
+            ids += [borrowing["id"] for borrowing in res.data["results"]]
+            url, params = res.data["next"], None
+
+        expected = [borrowing.id for borrowing in reversed(borrowings[6:])]
+        expected += [borrowing.id for borrowing in reversed(borrowings[:6])]
+        self.assertEqual(ids, expected)
+
+    def test_list_borrowing_cursor_with_wrong_types(self):
+        for values in (["abc", 1], [1, 2]):
+            cursor = base64.urlsafe_b64encode(json.dumps(values).encode())
+
+            res = self.client.get(BORROWING_URL, {"cursor": cursor.decode()})
+
+            self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_list_borrowing_expand_book_in_one_query(self):
+        books = [sample_book(title=f"Book {i}") for i in range(3)]
+        for book in books:
+            sample_borrowing(user_id=self.user_1.id, book_id=book.id)
+        sample_borrowing(user_id=self.user_1.id, book_id=999)
+
+        with self.assertNumQueries(3):
+            res = self.client.get(BORROWING_URL, {"expand": "book"})
+
+        expanded = {
+            borrowing["book_id"]: borrowing["book"]
+            for borrowing in res.data["results"]
+        }
+        for book in books:
+            self.assertEqual(expanded[book.id], BookListSerializer(book).data)
+        self.assertIsNone(expanded[999])
+        self.assertNotIn(
+            "book", self.client.get(BORROWING_URL).data["results"][0]
+        )
+
+    def test_list_borrowing_sparse_fields(self):
+        sample_book()
+        sample_borrowing(
+            user_id=self.user_1.id, actual_return_date=date.today()
+        )
+
+        res = self.client.get(
+            BORROWING_URL, {"fields": "id,is_active", "expand": "book"}
+        )
+
+        borrowing = res.data["results"][0]
+        self.assertEqual(list(borrowing), ["id", "is_active", "book"])
+        self.assertFalse(borrowing["is_active"])
+        self.assertEqual(borrowing["book"]["id"], 1)
+
+    def test_values_read_path_same_json_as_serializer(self):
+        sample_book()
+        borrowing = sample_borrowing(user_id=self.user_1.id)
+        sample_borrowing(
+            user_id=self.user_1.id, actual_return_date=date.today()
+        )
+        sample_borrowing(user_id=self.user_1.id, book_id=999)
+        requests = [
+            (BORROWING_URL, {}),
+            (BORROWING_URL, {"expand": "book"}),
+            (BORROWING_URL, {"pagination": "cursor", "page_size": 2}),
+            (BORROWING_URL, {"fields": "id,is_active"}),
+            (detail_url(borrowing.id), {"expand": "book"}),
+        ]
+
+        for url, params in requests:
+            res = self.client.get(url, params)
+            with override_settings(VALUES_READ_PATH=False):
+                expected = self.client.get(url, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(res.content, expected.content)
+
+    def test_async_list_same_json_as_wsgi(self):
+        sample_book()
+        sample_borrowing(user_id=self.user_1.id)
+        sample_borrowing(
+            user_id=self.user_1.id, actual_return_date=date.today()
+        )
+        sample_borrowing(user_id=self.user_1.id, book_id=999)
+        sample_borrowing(user_id=self.user_2.id)
+        token = AccessToken.for_user(self.user_1)
+
+        async def get(params, **headers):
+            return await self.async_client.get(
+                ASYNC_BORROWING_URL, params, **headers
+            )
+
+        for params in (
+            {},
+            {"expand": "book"},
+            {"is_active": "true"},
+            {"pagination": "cursor", "page_size": 2},
+            {"fields": "id,is_active", "expand": "book"},
+        ):
+            res = async_to_sync(get)(params, AUTHORIZATION=f"Bearer {token}")
+            expected = self.client.get(BORROWING_URL, params)
+
+            self.assertEqual(res.status_code, status.HTTP_200_OK)
+            self.assertEqual(
+                res.content.replace(b"/async", b""), expected.content
+            )
+
+        self.assertEqual(
+            async_to_sync(get)({}).status_code,
+            status.HTTP_401_UNAUTHORIZED,
+        )
+
+    def test_export_borrowings_staff_only_with_filters(self):
+        active = sample_borrowing(user_id=self.user_1.id)
+        sample_borrowing(
+            user_id=self.user_1.id, actual_return_date=date.today()
+        )
+        sample_borrowing(user_id=self.user_2.id)
+
+        forbidden = self.client.get(EXPORT_URL)
+        self.client.force_authenticate(self.admin)
+        res = self.client.get(
+            EXPORT_URL,
+            {
+                "export_format": "csv",
+                "user_id": self.user_1.id,
+                "is_active": "true",
+            },
+        )
+
+        self.assertEqual(forbidden.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertEqual(res["Content-Type"], "text/csv; charset=utf-8")
+        self.assertEqual(
+            b"".join(res.streaming_content).decode().splitlines(),
+            [
+                "id,borrow_date,expected_return_date,actual_return_date,"
+                "book_id,user_id,is_active",
+                f"{active.id},{date.today()},{date.today()},,1,"
+                f"{self.user_1.id},True",
+            ],
+        )
+
     def test_retrieve_borrowing_detail(self):
         borrowing = sample_borrowing(user_id=self.user_1.id)
 
@@ -131,6 +301,166 @@ class AuthenticatedBookApiTests(TestCase):
         res = self.client.post(BORROWING_URL, borrowing)
         self.assertEqual(res.status_code, status.HTTP_201_CREATED)
 
+    def test_create_borrowing_book_not_available(self):
+        book = sample_book(inventory=1)
+        borrowing = {
+            "expected_return_date": date.today(),
+            "book_id": book.id,
+        }
+
+        res_1 = self.client.post(BORROWING_URL, borrowing)
+        res_2 = self.client.post(BORROWING_URL, borrowing)
+
+        book.refresh_from_db()
+        self.assertEqual(res_1.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res_2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(book.inventory, 0)
+        self.assertEqual(Borrowing.objects.count(), 1)
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_checkout_and_return_update_book_last(self):
+        book = sample_book()
+
+        def writes(request, *args):
+            with CaptureQueriesContext(connection) as queries:
+                request(*args)
+            return [
+                query["sql"].split(" ")[:2]
+                for query in queries
+                if query["sql"].startswith(("INSERT", "UPDATE"))
+            ]
+
+        checkout = writes(
+            self.client.post,
+            BORROWING_URL,
+            {"book_id": book.id, "expected_return_date": date.today()},
+        )
+        borrowing_id = Borrowing.objects.get().id
+        returned = writes(
+            self.client.put,
+            detail_url(borrowing_id),
+            {
+                "expected_return_date": date.today(),
+                "actual_return_date": date.today(),
+            },
+        )
+
+        self.assertEqual(
+            checkout,
+            [
+                ["INSERT", "INTO"],
+                ["INSERT", "INTO"],
+                ["UPDATE", '"book_book"'],
+            ],
+        )
+        self.assertEqual(
+            returned,
+            [
+                ["UPDATE", '"borrowing_borrowing"'],
+                ["INSERT", "INTO"],
+                ["UPDATE", '"book_book"'],
+            ],
+        )
+
+    def test_return_borrowing_only_once(self):
+        book = sample_book(inventory=1)
+        borrowing = sample_borrowing(user_id=self.user_1.id, book_id=book.id)
+        payload = {
+            "expected_return_date": borrowing.expected_return_date,
+            "actual_return_date": date.today(),
+        }
+
+        res_1 = self.client.put(detail_url(borrowing.id), payload)
+        res_2 = self.client.put(detail_url(borrowing.id), payload)
+
+        book.refresh_from_db()
+        self.assertEqual(res_1.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_2.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(book.inventory, 2)
+
+    def test_returned_borrowing_can_not_be_reopened(self):
+        book = sample_book(inventory=1)
+        borrowing = sample_borrowing(user_id=self.user_1.id, book_id=book.id)
+        self.client.put(
+            detail_url(borrowing.id),
+            {
+                "expected_return_date": borrowing.expected_return_date,
+                "actual_return_date": date.today(),
+            },
+        )
+
+        res = self.client.put(
+            detail_url(borrowing.id),
+            {
+                "expected_return_date": borrowing.expected_return_date,
+                "actual_return_date": "",
+            },
+        )
+
+        book.refresh_from_db()
+        borrowing.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(borrowing.actual_return_date, date.today())
+        self.assertEqual(book.inventory, 2)
+
+    def test_bulk_create_borrowings(self):
+        book_1 = sample_book(inventory=2)
+        book_2 = sample_book(inventory=1)
+
+        res = self.client.post(BULK_URL, {
+            "book_ids": [book_1.id, book_2.id, book_1.id],
+            "expected_return_date": date.today(),
+        }, format="json")
+
+        book_1.refresh_from_db()
+        book_2.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(len(res.data), 3)
+        self.assertEqual((book_1.inventory, book_2.inventory), (0, 0))
+        self.assertEqual(
+            Borrowing.objects.filter(user_id=self.user_1.id).count(), 3
+        )
+        self.assertEqual(OutboxMessage.objects.count(), 1)
+
+    def test_bulk_create_borrowings_all_or_nothing(self):
+        book_1 = sample_book(inventory=2)
+        book_2 = sample_book(inventory=1)
+
+        res = self.client.post(BULK_URL, {
+            "book_ids": [book_1.id, book_2.id, book_2.id],
+            "expected_return_date": date.today(),
+        }, format="json")
+
+        book_1.refresh_from_db()
+        self.assertEqual(res.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(book_1.inventory, 2)
+        self.assertFalse(Borrowing.objects.exists())
+
+    def test_bulk_return_borrowings(self):
+        book = sample_book(inventory=0)
+        borrowings = [
+            sample_borrowing(user_id=self.user_1.id, book_id=book.id)
+            for _ in range(2)
+        ]
+        other_user_borrowing = sample_borrowing(
+            user_id=self.user_2.id, book_id=book.id
+        )
+
+        res_other = self.client.post(BULK_RETURN_URL, {
+            "borrowing_ids": [other_user_borrowing.id],
+            "actual_return_date": date.today(),
+        }, format="json")
+        res = self.client.post(BULK_RETURN_URL, {
+            "borrowing_ids": [borrowing.id for borrowing in borrowings],
+            "actual_return_date": date.today(),
+        }, format="json")
+
+        book.refresh_from_db()
+        self.assertEqual(res_other.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(any(borrowing["is_active"] for borrowing in res.data))
+        self.assertEqual(book.inventory, 2)
+
     def test_delete_borrowing_forbidden_auth_user(self):
         sample_book()
         borrowing = sample_borrowing(user_id=self.user_1.id)
@@ -138,3 +468,66 @@ class AuthenticatedBookApiTests(TestCase):
         url = detail_url(borrowing.id)
         res = self.client.delete(url)
         self.assertEqual(res.status_code, status.HTTP_403_FORBIDDEN)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class ConcurrentCheckoutTests(TransactionTestCase):
+    def test_concurrent_checkouts_never_oversell(self):
+        inventory = 5
+        book = sample_book(inventory=inventory)
+        users = [
+            get_user_model().objects.create_user(f"reader-{i}@user.com")
+            for i in range(20)
+        ]
+        barrier = threading.Barrier(len(users))
+        outcomes = {}
+
+        def retry_locked(func):
+            # SQLite serializes writers with "table is locked" errors,
+            # PostgreSQL runs the conditional updates concurrently.
+            while True:
+                try:
+                    return func()
+                except OperationalError:
+                    time.sleep(0.01)
+
+        def checkout(user):
+            client = APIClient()
+            client.force_authenticate(user)
+            barrier.wait()
+            try:
+                while user.id not in outcomes:
+                    try:
+                        res = client.post(BORROWING_URL, {
+                            "expected_return_date": date.today(),
+                            "book_id": book.id,
+                        })
+                        outcomes[user.id] = res.status_code
+                    except OperationalError:
+                        # The lock may have hit after the commit.
+                        if retry_locked(
+                            Borrowing.objects.filter(user_id=user.id).exists
+                        ):
+                            outcomes[user.id] = status.HTTP_201_CREATED
+            finally:
+                connection.close()
+
+        threads = [
+            threading.Thread(target=checkout, args=(user,)) for user in users
+        ]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        book.refresh_from_db()
+        statuses = list(outcomes.values())
+        self.assertEqual(statuses.count(status.HTTP_201_CREATED), inventory)
+        self.assertEqual(
+            statuses.count(status.HTTP_400_BAD_REQUEST),
+            len(users) - inventory,
+        )
+        self.assertEqual(book.inventory, 0)
+        self.assertEqual(
+            Borrowing.objects.filter(book_id=book.id).count(), inventory
+        )
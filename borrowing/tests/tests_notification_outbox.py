@@ -0,0 +1,90 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from rest_framework.test import APIClient
+from rest_framework import status
+
+from book.tests.test_book_api import sample_book
+from borrowing.models import OutboxMessage
+from borrowing.outbox import deliver_pending, enqueue_notification
+
+from library_service import notification
+
+BORROWING_URL = reverse("borrowing:borrowing-list")
+
+
+class FailingBackend:
+    def send(self, message):
+        raise ConnectionError("Telegram is down")
+
+
+@override_settings(
+    NOTIFICATION_BACKEND="library_service.notification.LocmemBackend",
+    DATABASE_REPLICAS=[],
+)
+class NotificationOutboxTests(TestCase):
+    def setUp(self):
+        notification.outbox.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com",
+            "user12345",
+        )
+        self.client.force_authenticate(self.user)
+
+    def test_create_borrowing_enqueues_notification(self):
+        book = sample_book(title="Metro 2033")
+
+        res = self.client.post(BORROWING_URL, {
+            "expected_return_date": date.today(),
+            "book_id": book.id,
+        })
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(notification.outbox, [])
+        message = OutboxMessage.objects.get()
+        self.assertIn("title: Metro 2033", message.message)
+
+    def test_deliver_pending_sends_in_batches(self):
+        for i in range(5):
+            enqueue_notification(f"Message {i}")
+
+        stats = deliver_pending(batch_size=2)
+
+        self.assertEqual(stats["sent"], 5)
+        self.assertEqual(
+            notification.outbox, [f"Message {i}" for i in range(5)]
+        )
+        self.assertFalse(
+            OutboxMessage.objects.exclude(
+                status=OutboxMessage.StatusChoices.SENT
+            ).exists()
+        )
+
+    @override_settings(
+        NOTIFICATION_BACKEND=(
+            "borrowing.tests.tests_notification_outbox.FailingBackend"
+        ),
+        NOTIFICATION_OUTBOX_MAX_ATTEMPTS=2,
+    )
+    def test_deliver_pending_retries_with_backoff(self):
+        message = enqueue_notification("Overdue")
+
+        first = deliver_pending()
+        second = deliver_pending()
+        message.refresh_from_db()
+        retry_at = message.next_attempt_at
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        third = deliver_pending()
+        message.refresh_from_db()
+
+        self.assertEqual(first["retried"], 1)
+        self.assertEqual(second, {"sent": 0, "retried": 0, "failed": 0})
+        self.assertGreater(retry_at, timezone.now() + timedelta(seconds=20))
+        self.assertEqual(third["failed"], 1)
+        self.assertEqual(message.status, OutboxMessage.StatusChoices.FAILED)
+        self.assertIn("Telegram is down", message.last_error)
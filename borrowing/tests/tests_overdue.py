@@ -0,0 +1,271 @@
+from datetime import date, timedelta
+
+from django.contrib.auth import get_user_model
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from book.tests.test_book_api import sample_book
+from borrowing.models import Borrowing, OverdueSweep
+from borrowing.overdue import (
+    NO_OVERDUE_MESSAGE,
+    overdue_queryset,
+    partition_ids,
+)
+from borrowing.tasks import merge_overdue_results, overdue_borrowings
+from borrowing.tests.tests_borrowing_api import sample_borrowing
+
+from library_service import celery_app, notification
+
+
+YESTERDAY = date.today() - timedelta(days=1)
+
+
+@override_settings(
+    NOTIFICATION_BACKEND="library_service.notification.LocmemBackend"
+)
+class OverdueBorrowingsTaskTests(TestCase):
+    def setUp(self):
+        notification.outbox.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com",
+            "user12345",
+        )
+
+    def create_overdue(self, count):
+        for i in range(count):
+            book = sample_book(title=f"Book {i}")
+            sample_borrowing(
+                book_id=book.id,
+                user_id=self.user.id,
+                expected_return_date=YESTERDAY,
+            )
+
+    def test_no_overdue_borrowings(self):
+        sample_borrowing(user_id=self.user.id)
+        sample_borrowing(
+            user_id=self.user.id,
+            expected_return_date=YESTERDAY,
+            actual_return_date=date.today(),
+        )
+
+        stats = overdue_borrowings()
+
+        self.assertEqual(stats["rows"], 0)
+        self.assertEqual(notification.outbox, [NO_OVERDUE_MESSAGE])
+
+    def test_overdue_borrowings_notified_once_each(self):
+        self.create_overdue(3)
+
+        stats = overdue_borrowings()
+
+        self.assertEqual(stats["rows"], 3)
+        self.assertEqual(len(notification.outbox), 3)
+        self.assertIn("Title: Book 0", notification.outbox[0])
+        self.assertIn("email: user@user.com", notification.outbox[0])
+
+    @override_settings(OVERDUE_CHUNK_SIZE=100)
+    def test_overdue_query_count_does_not_grow_with_rows(self):
+        self.create_overdue(2)
+        few = overdue_borrowings()
+        self.create_overdue(20)
+        many = overdue_borrowings()
+
+        self.assertEqual(many["rows"], 22)
+        self.assertEqual(few["queries"], many["queries"])
+
+    def test_overdue_digest_grouped_by_user(self):
+        self.create_overdue(3)
+        other = get_user_model().objects.create_user("other@user.com")
+        sample_borrowing(
+            book_id=sample_book().id,
+            user_id=other.id,
+            expected_return_date=YESTERDAY,
+        )
+
+        stats = overdue_borrowings(group_by="user")
+
+        self.assertEqual(stats["rows"], 4)
+        self.assertEqual(stats["messages"], 1)
+        digest = notification.outbox[0]
+        self.assertTrue(digest.startswith("Overdue borrowings: 4"))
+        self.assertEqual(digest.count("email: user@user.com"), 1)
+        self.assertEqual(digest.count("email: other@user.com"), 1)
+        self.assertEqual(digest.count("- id:"), 4)
+
+    @override_settings(
+        NOTIFICATION_MESSAGE_LIMIT=300, OVERDUE_DIGEST_MAX_MESSAGES=2
+    )
+    def test_overdue_digest_is_bounded(self):
+        self.create_overdue(50)
+
+        stats = overdue_borrowings(group_by="book")
+
+        self.assertEqual(stats["messages"], 2)
+        for message in notification.outbox:
+            self.assertLessEqual(len(message), 300)
+        listed = sum(message.count("- id:") for message in notification.outbox)
+        self.assertTrue(
+            notification.outbox[-1].endswith(f"... and {50 - listed} more")
+        )
+
+    @override_settings(OVERDUE_FAN_OUT_CHUNK_SIZE=4)
+    def test_overdue_fan_out_merges_chunk_results(self):
+        self.create_overdue(10)
+
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(
+            setattr, celery_app.conf, "task_always_eager", False
+        )
+
+        result = overdue_borrowings(fan_out=True)
+
+        self.assertEqual(result["chunks"], 3)
+        self.assertEqual(len(notification.outbox), 10)
+        self.assertEqual(
+            merge_overdue_results.apply(args=([
+                {"rows": 4, "queries": 3, "messages": 4, "elapsed": 0.2},
+                {"rows": 2, "queries": 3, "messages": 2, "elapsed": 0.5},
+            ],)).get(),
+            {
+                "chunks": 2,
+                "rows": 6,
+                "queries": 6,
+                "messages": 6,
+                "elapsed": 0.5,
+                "pending_since": None,
+            },
+        )
+
+    @override_settings(OVERDUE_FAN_OUT_CHUNK_SIZE=4)
+    def test_overdue_fan_out_sends_one_digest(self):
+        for i in range(8):
+            self.create_overdue(1)
+            for _ in range(5):
+                sample_borrowing(
+                    user_id=self.user.id,
+                    expected_return_date=YESTERDAY,
+                    actual_return_date=date.today(),
+                )
+
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(
+            setattr, celery_app.conf, "task_always_eager", False
+        )
+
+        result = overdue_borrowings(group_by="user", fan_out=True)
+
+        self.assertEqual(result["chunks"], 2)
+        self.assertEqual(len(notification.outbox), 1)
+        digest = notification.outbox[0]
+        self.assertTrue(digest.startswith("Overdue borrowings: 8"))
+        self.assertEqual(digest.count("email: user@user.com"), 1)
+        self.assertEqual(digest.count("- id:"), 8)
+
+    @override_settings(
+        OVERDUE_FAN_OUT_CHUNK_SIZE=4,
+        NOTIFICATION_MESSAGE_LIMIT=300,
+        OVERDUE_DIGEST_MAX_MESSAGES=1,
+    )
+    def test_incremental_fan_out_digest_is_bounded(self):
+        self.create_overdue(10)
+
+        celery_app.conf.task_always_eager = True
+        self.addCleanup(
+            setattr, celery_app.conf, "task_always_eager", False
+        )
+
+        overdue_borrowings(group_by="book", fan_out=True, incremental=True)
+
+        self.assertEqual(len(notification.outbox), 1)
+        self.assertLessEqual(len(notification.outbox[0]), 300)
+        listed = notification.outbox[0].count("- id:")
+        self.assertLess(listed, 10)
+        self.assertEqual(
+            Borrowing.objects.filter(overdue_notified_at__isnull=False)
+            .count(),
+            listed,
+        )
+        self.assertEqual(OverdueSweep.objects.get().threshold, YESTERDAY)
+
+    def test_overdue_fan_out_without_overdue_borrowings(self):
+        result = overdue_borrowings(fan_out=True)
+
+        self.assertEqual(result["chunks"], 0)
+        self.assertEqual(notification.outbox, [NO_OVERDUE_MESSAGE])
+
+    def test_partition_ids(self):
+        self.create_overdue(5)
+        first = overdue_queryset().first().id
+
+        self.assertEqual(
+            partition_ids(overdue_queryset(), 2),
+            [
+                (first, first + 1),
+                (first + 2, first + 3),
+                (first + 4, first + 4),
+            ],
+        )
+
+    def test_incremental_overdue_notifies_each_borrowing_once(self):
+        self.create_overdue(3)
+
+        first = overdue_borrowings(incremental=True)
+        second = overdue_borrowings(incremental=True)
+
+        self.assertEqual(first["rows"], 3)
+        self.assertEqual(second["rows"], 0)
+        self.assertEqual(OverdueSweep.objects.count(), 2)
+        self.assertFalse(
+            Borrowing.objects.filter(overdue_notified_at__isnull=True).exists()
+        )
+
+    @override_settings(
+        NOTIFICATION_MESSAGE_LIMIT=300, OVERDUE_DIGEST_MAX_MESSAGES=1
+    )
+    def test_incremental_digest_stamps_only_listed_borrowings(self):
+        self.create_overdue(10)
+
+        first = overdue_borrowings(group_by="book", incremental=True)
+        listed = notification.outbox[0].count("- id:")
+        second = overdue_borrowings(group_by="book", incremental=True)
+
+        self.assertLess(listed, 10)
+        self.assertEqual(first["rows"], 10)
+        self.assertEqual(second["rows"], 10 - listed)
+        self.assertEqual(
+            OverdueSweep.objects.order_by("id").first().threshold, YESTERDAY
+        )
+
+    @override_settings(OVERDUE_REMINDER_INTERVAL_DAYS=7)
+    def test_incremental_overdue_new_and_reminders_only(self):
+        OverdueSweep.objects.create(threshold=YESTERDAY)
+        book = sample_book()
+        notified_recently = sample_borrowing(
+            book_id=book.id,
+            user_id=self.user.id,
+            expected_return_date=YESTERDAY - timedelta(days=3),
+        )
+        notified_long_ago = sample_borrowing(
+            book_id=book.id,
+            user_id=self.user.id,
+            expected_return_date=YESTERDAY - timedelta(days=30),
+        )
+        new_overdue = sample_borrowing(
+            book_id=book.id,
+            user_id=self.user.id,
+            expected_return_date=YESTERDAY,
+        )
+        Borrowing.objects.filter(id=notified_recently.id).update(
+            overdue_notified_at=timezone.now() - timedelta(days=1)
+        )
+        Borrowing.objects.filter(id=notified_long_ago.id).update(
+            overdue_notified_at=timezone.now() - timedelta(days=8)
+        )
+
+        stats = overdue_borrowings(incremental=True)
+
+        self.assertEqual(stats["rows"], 2)
+        self.assertEqual(
+            [message.split("\n")[1] for message in notification.outbox],
+            [f"id: {notified_long_ago.id}", f"id: {new_overdue.id}"],
+        )
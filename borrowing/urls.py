@@ -1,13 +1,19 @@
 from django.urls import path, include
 from rest_framework import routers
 from borrowing.views import BorrowingViewSet
+from library_service.async_views import AsyncValuesView
 
 router = routers.DefaultRouter()
 router.register("borrowings", BorrowingViewSet)
 
 
 urlpatterns = [
-    path("", include(router.urls))
+    path("", include(router.urls)),
+    path(
+        "async/borrowings/",
+        AsyncValuesView.as_view(viewset_class=BorrowingViewSet, action="list"),
+        name="borrowing-list-async",
+    ),
 ]
 
 app_name = "borrowing"
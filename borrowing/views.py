@@ -1,41 +1,73 @@
 from drf_spectacular.utils import extend_schema, OpenApiParameter
-from rest_framework import viewsets
-from rest_framework.pagination import PageNumberPagination
+from rest_framework import status, viewsets
+from rest_framework.decorators import action
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
 
+from book.models import Book
+from book.serializers import BookListSerializer
 from borrowing.models import Borrowing
 from borrowing.permissions import IsAdminOrReadAndUpdateOnly
 from borrowing.serializers import (
     BorrowingSerializer,
     BorrowingListSerializer,
     BorrowingDetailSerializer,
+    BorrowingBulkCreateSerializer,
+    BorrowingBulkReturnSerializer,
 )
+from library_service.export import (
+    EXPORT_FORMAT_PARAMETER,
+    EXPORT_RESPONSES,
+    export_response,
+)
+from library_service.fields import sparse_queryset
+from library_service.pagination import PageNumberOrKeysetPagination
+from library_service.query_params import params_to_ints, params_to_list
+from library_service.routers import ReplicaReadMixin
+from library_service.values import ValuesReadMixin, ValuesRepresentation
 
 
-class BorrowingPagination(PageNumberPagination):
-    page_size = 5
-    page_size_query_param = "page_size"
-    max_page_size = 100
+class BorrowingPagination(PageNumberOrKeysetPagination):
+    keyset_ordering = ("-borrow_date", "-id")
 
 
-class BorrowingViewSet(viewsets.ModelViewSet):
+class BorrowingViewSet(
+    ReplicaReadMixin, ValuesReadMixin, viewsets.ModelViewSet
+):
     queryset = Borrowing.objects.all()
     serializer_class = BorrowingSerializer
 
     pagination_class = BorrowingPagination
     permission_classes = (IsAdminOrReadAndUpdateOnly, )
+    throttle_scope = "borrowings"
 
     def get_serializer_class(self):
-        if self.action in ("list", "retrieve"):
+        if self.action in ("list", "retrieve", "export"):
             return BorrowingListSerializer
         if self.action == "update":
             return BorrowingDetailSerializer
+        if self.action == "bulk":
+            return BorrowingBulkCreateSerializer
+        if self.action == "bulk_return":
+            return BorrowingBulkReturnSerializer
 
         return BorrowingSerializer
 
-    @staticmethod
-    def _params_to_ints(qs):
-        """Converts a list of string IDs to a list of integers"""
-        return [int(str_id) for str_id in qs.split(",")]
+    def expand_book(self):
+        expand = params_to_list(self.request.query_params.get("expand"))
+        return self.action in ("list", "retrieve") and "book" in expand
+
+    def get_serializer(self, *args, **kwargs):
+        """Resolve the books of all rows at once for ?expand=book"""
+        if self.expand_book() and args:
+            rows = args[0] if kwargs.get("many") else [args[0]]
+            context = kwargs.setdefault(
+                "context", self.get_serializer_context()
+            )
+            context["books"] = Book.objects.in_bulk(
+                {borrowing.book_id for borrowing in rows}
+            )
+        return super().get_serializer(*args, **kwargs)
 
     def get_queryset(self):
 
@@ -48,7 +80,7 @@ class BorrowingViewSet(viewsets.ModelViewSet):
         is_active = self.request.query_params.get("is_active")
 
         if user_id:
-            user_ids = self._params_to_ints(user_id)
+            user_ids = params_to_ints(user_id)
             queryset = queryset.filter(user_id__in=user_ids)
 
         if is_active is not None:
@@ -57,7 +89,67 @@ class BorrowingViewSet(viewsets.ModelViewSet):
             if is_active == "false":
                 queryset = queryset.filter(actual_return_date__isnull=False)
 
-        return queryset.distinct()
+        return queryset
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.action in ("list", "retrieve"):
+            queryset = sparse_queryset(
+                queryset,
+                self.get_serializer_class(),
+                self.request,
+                extra=("book_id",) if self.expand_book() else (),
+            )
+        return queryset
+
+    def get_values_columns(self, representation, queryset):
+        columns = super().get_values_columns(representation, queryset)
+        if self.expand_book():
+            columns.add("book_id")
+        return columns
+
+    @staticmethod
+    def book_values(rows, book_representation):
+        return Book.objects.filter(
+            id__in={row["book_id"] for row in rows}
+        ).values(*book_representation.columns)
+
+    @staticmethod
+    def add_books(data, rows, book_representation, books):
+        books = {
+            book["id"]: book_representation.to_representation(book)
+            for book in books
+        }
+        for item, row in zip(data, rows):
+            item["book"] = books.get(row["book_id"])
+
+    def get_values_data(self, rows, representation):
+        """Resolve the books of all rows at once for ?expand=book"""
+        data = super().get_values_data(rows, representation)
+        if self.expand_book():
+            book_representation = ValuesRepresentation(BookListSerializer())
+            self.add_books(
+                data,
+                rows,
+                book_representation,
+                self.book_values(rows, book_representation),
+            )
+        return data
+
+    async def aget_values_data(self, rows, representation):
+        if not self.expand_book():
+            return await super().aget_values_data(rows, representation)
+
+        data = super().get_values_data(rows, representation)
+        book_representation = ValuesRepresentation(BookListSerializer())
+        books = self.book_values(rows, book_representation)
+        self.add_books(
+            data,
+            rows,
+            book_representation,
+            [book async for book in books],
+        )
+        return data
 
     def perform_create(self, serializer):
         serializer.save(user_id=self.request.user.id)
@@ -74,7 +166,56 @@ class BorrowingViewSet(viewsets.ModelViewSet):
                 type=str,
                 description="Filter by user_id & is_active (ex. ?is_active=(true/false))",
             ),
+            OpenApiParameter(
+                "expand",
+                type=str,
+                description="Include the book of each borrowing (ex. ?expand=book)",
+            ),
+            OpenApiParameter(
+                "fields",
+                type=str,
+                description="Only return these fields (ex. ?fields=id,is_active)",
+            ),
+            OpenApiParameter(
+                "omit",
+                type=str,
+                description="Leave these fields out (ex. ?omit=user_id)",
+            ),
         ]
     )
     def list(self, request, *args, **kwargs):
         return super().list(request, *args, **kwargs)
+
+    @extend_schema(responses={201: BorrowingSerializer(many=True)})
+    @action(detail=False, methods=["post"])
+    def bulk(self, request):
+        """Borrow several books at once, in one transaction"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        borrowings = serializer.save()
+        return Response(
+            BorrowingSerializer(borrowings, many=True).data,
+            status=status.HTTP_201_CREATED,
+        )
+
+    @extend_schema(responses={200: BorrowingListSerializer(many=True)})
+    @action(detail=False, methods=["post"], url_path="bulk-return")
+    def bulk_return(self, request):
+        """Return several borrowings at once, in one transaction"""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        borrowings = serializer.save(queryset=self.get_queryset())
+        return Response(BorrowingListSerializer(borrowings, many=True).data)
+
+    @extend_schema(
+        parameters=[EXPORT_FORMAT_PARAMETER], responses=EXPORT_RESPONSES
+    )
+    @action(detail=False, methods=["get"], permission_classes=[IsAdminUser])
+    def export(self, request):
+        """Stream the filtered borrowing history as NDJSON or CSV"""
+        return export_response(
+            request,
+            self.filter_queryset(self.get_queryset()),
+            ValuesRepresentation(self.get_serializer()),
+            "borrowings",
+        )
@@ -12,5 +12,10 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "library_service.settings")
+# Sync views run in a new thread per request under ASGI, so persistent
+# connections would never be reused, only leaked: close them at the end
+# of each request unless DB_CONN_MAX_AGE says otherwise. Use
+# DB_POOL_SIZE to reuse connections across requests.
+os.environ.setdefault("DB_CONN_MAX_AGE", "0")
 
 application = get_asgi_application()
@@ -0,0 +1,72 @@
+from asgiref.sync import sync_to_async
+from django.http import HttpResponse
+from django.views import View
+from rest_framework.exceptions import APIException
+
+
+class AsyncValuesView(View):
+    """
+    Async list or retrieve of a ValuesReadMixin viewset, for ASGI.
+
+    The viewset still builds the queryset and checks permissions and
+    throttles, in a thread, so both paths answer alike, but
+    authentication, the pagination COUNT and the page itself go through
+    the async cache and ORM APIs instead of holding a worker thread for
+    the whole request.
+    Responses are not cached, unlike the WSGI book endpoints.
+    """
+
+    viewset_class = None
+    action = "list"
+
+    async def authenticate(self, request):
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, "aauthenticate"):
+                    user_auth = await authenticator.aauthenticate(request)
+                else:
+                    user_auth = await sync_to_async(
+                        authenticator.authenticate
+                    )(request)
+            except APIException:
+                request._not_authenticated()
+                raise
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
+
+    async def get(self, request, *args, **kwargs):
+        viewset = self.viewset_class(
+            action_map={"get": self.action},
+            args=args,
+            kwargs=kwargs,
+            format_kwarg=None,
+        )
+        viewset.headers = viewset.default_response_headers
+        request = viewset.request = viewset.initialize_request(
+            request, *args, **kwargs
+        )
+        try:
+            await self.authenticate(request)
+            # Only the checks left, authentication already ran. They are
+            # sync (throttle counters in Redis, the primary pin in the
+            # cache), so they run in a thread off the event loop
+            await sync_to_async(viewset.initial)(request, *args, **kwargs)
+            handler = getattr(viewset, f"a{self.action}")
+            response = await handler(request, *args, **kwargs)
+        except Exception as exc:
+            response = viewset.handle_exception(exc)
+
+        response = viewset.finalize_response(
+            request, response, *args, **kwargs
+        )
+        # Rendered here, Django would render a TemplateResponse in a
+        # thread of its own
+        plain = HttpResponse(
+            response.rendered_content, status=response.status_code
+        )
+        for header, value in response.items():
+            plain[header] = value
+        return plain
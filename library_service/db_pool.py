@@ -0,0 +1,209 @@
+import threading
+import time
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import OperationalError, connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.utils.deprecation import MiddlewareMixin
+
+
+class PoolTimeout(OperationalError):
+    pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of DB-API connections shared by the threads of a
+    process, or its green threads under the Celery eventlet pool, which
+    patches threading.
+
+    At most `size` connections are open at once, callers wait up to
+    `timeout` seconds for one to be released. Connections older than
+    `max_lifetime` seconds are closed instead of going back to the pool.
+    """
+
+    def __init__(self, size, timeout, max_lifetime):
+        self.size = size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.condition = threading.Condition()
+        self.idle = []
+        self.opened_at = {}
+        self.connecting = 0
+        self.stats = Counter()
+
+    def acquire(self, connect, check=None):
+        """
+        An idle connection that passes `check`, or a new one from
+        `connect` while the pool is not full
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            connection = self.take(deadline)
+            if connection is None:
+                break
+            if check is None or check(connection):
+                with self.condition:
+                    self.stats["reused"] += 1
+                return connection
+            self.discard(connection)
+
+        try:
+            connection = connect()
+        except BaseException:
+            with self.condition:
+                self.connecting -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.connecting -= 1
+            self.opened_at[id(connection)] = time.monotonic()
+            self.stats["opened"] += 1
+        return connection
+
+    def take(self, deadline):
+        """Pop an idle connection, or reserve the slot of a new one"""
+        with self.condition:
+            while True:
+                if self.idle:
+                    return self.idle.pop()
+                if len(self.opened_at) + self.connecting < self.size:
+                    self.connecting += 1
+                    return None
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"No database connection free within "
+                        f"{self.timeout}s, the pool size is {self.size}"
+                    )
+                self.stats["waits"] += 1
+                self.condition.wait(remaining)
+
+    def release(self, connection, reusable=True):
+        opened_at = self.opened_at.get(id(connection), 0)
+        if (
+            not reusable
+            or time.monotonic() - opened_at > self.max_lifetime
+        ):
+            self.discard(connection)
+            return
+        with self.condition:
+            self.idle.append(connection)
+            self.condition.notify()
+
+    def discard(self, connection):
+        with self.condition:
+            self.opened_at.pop(id(connection), None)
+            self.stats["closed"] += 1
+            self.condition.notify()
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    def close(self):
+        with self.condition:
+            idle, self.idle = self.idle, []
+        for connection in idle:
+            self.discard(connection)
+
+    def get_stats(self):
+        with self.condition:
+            idle = len(self.idle)
+            open_connections = len(self.opened_at)
+        return {
+            "pool": True,
+            "size": self.size,
+            "open": open_connections,
+            "idle": idle,
+            "in_use": open_connections - idle,
+            **{
+                name: self.stats[name]
+                for name in ("opened", "reused", "closed", "waits", "timeouts")
+            },
+        }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def _target(settings_dict):
+    return tuple(
+        settings_dict.get(key) for key in ("NAME", "HOST", "PORT", "USER")
+    )
+
+
+def get_pool(alias, settings_dict):
+    """
+    The pool of a database alias, replaced along with its connections
+    when the alias points at another database (the test database)
+    """
+    with _pools_lock:
+        target = _target(settings_dict)
+        pool = _pools.get(alias)
+        if pool is None or pool.target != target:
+            if pool is not None:
+                pool.close()
+            pool = ConnectionPool(
+                settings_dict["POOL_SIZE"],
+                settings_dict["POOL_TIMEOUT"],
+                settings_dict["POOL_MAX_LIFETIME"],
+            )
+            pool.target = target
+            _pools[alias] = pool
+        return pool
+
+
+# Connections opened, and requests that started with one still open,
+# per database alias of the process
+_connection_counts = defaultdict(Counter)
+_connection_counts_lock = threading.Lock()
+
+
+def _count_connection(alias, name):
+    with _connection_counts_lock:
+        _connection_counts[alias][name] += 1
+
+
+@receiver(connection_created)
+def connection_opened(sender, connection, **kwargs):
+    _count_connection(connection.alias, "opened")
+
+
+class ConnectionStatsMiddleware(MiddlewareMixin):
+    """
+    Count the requests that find a connection kept from an earlier
+    request, close_old_connections() already dropped the expired ones
+    """
+
+    def process_request(self, request):
+        for connection in connections.all(initialized_only=True):
+            if connection.connection is not None:
+                _count_connection(connection.alias, "reused")
+
+
+def connection_stats():
+    """
+    Pool counters of each database, or the connections opened and
+    reused with its persistent connection setup
+    """
+    stats = {}
+    for alias, settings_dict in settings.DATABASES.items():
+        pool = _pools.get(alias)
+        if pool is not None:
+            stats[alias] = pool.get_stats()
+            continue
+        with _connection_counts_lock:
+            counts = Counter(_connection_counts[alias])
+        stats[alias] = {
+            "pool": False,
+            "conn_max_age": settings_dict.get("CONN_MAX_AGE", 0),
+            "health_checks": settings_dict.get("CONN_HEALTH_CHECKS", False),
+            "opened": counts["opened"],
+            "reused": counts["reused"],
+        }
+    return stats
@@ -0,0 +1,99 @@
+import csv
+import io
+
+from django.conf import settings
+from django.http import StreamingHttpResponse
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import OpenApiParameter
+from rest_framework.exceptions import ValidationError
+
+from library_service.renderers import ORJSONRenderer
+
+
+EXPORT_FORMAT_QUERY_PARAM = "export_format"
+EXPORT_CONTENT_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv; charset=utf-8",
+}
+
+EXPORT_FORMAT_PARAMETER = OpenApiParameter(
+    EXPORT_FORMAT_QUERY_PARAM,
+    type=str,
+    enum=list(EXPORT_CONTENT_TYPES),
+    description="Export format, ndjson by default (ex. ?export_format=csv)",
+)
+EXPORT_RESPONSES = {
+    (200, content_type.split(";")[0]): OpenApiTypes.STR
+    for content_type in EXPORT_CONTENT_TYPES.values()
+}
+
+
+def iter_export_rows(queryset, representation, chunk_size=None):
+    """Representations of the rows, read with a server-side cursor"""
+    rows = queryset.values(*representation.columns).iterator(
+        chunk_size=chunk_size or settings.EXPORT_CHUNK_SIZE
+    )
+    for row in rows:
+        yield representation.to_representation(row)
+
+
+def ndjson_lines(items):
+    renderer = ORJSONRenderer()
+    for item in items:
+        yield renderer.render(item) + b"\n"
+
+
+def csv_lines(items, header):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(header)
+    for item in items:
+        writer.writerow(item.values())
+        yield buffer.getvalue().encode()
+        buffer.seek(0)
+        buffer.truncate()
+
+
+def export_content(queryset, representation, export_format, chunk_size=None):
+    """
+    Bytes of the exported rows, yielded once per chunk of rows,
+    so memory stays flat whatever the size of the table.
+    """
+    chunk_size = chunk_size or settings.EXPORT_CHUNK_SIZE
+    items = iter_export_rows(queryset, representation, chunk_size)
+    if export_format == "csv":
+        header = [name for name, _ in representation.getters]
+        lines = csv_lines(items, header)
+    else:
+        lines = ndjson_lines(items)
+
+    chunk = []
+    for line in lines:
+        chunk.append(line)
+        if len(chunk) >= chunk_size:
+            yield b"".join(chunk)
+            chunk = []
+    if chunk:
+        yield b"".join(chunk)
+
+
+def export_response(request, queryset, representation, filename):
+    export_format = request.query_params.get(
+        EXPORT_FORMAT_QUERY_PARAM, "ndjson"
+    )
+    if export_format not in EXPORT_CONTENT_TYPES:
+        raise ValidationError(
+            {EXPORT_FORMAT_QUERY_PARAM: "Must be ndjson or csv"}
+        )
+
+    # The rows are read once the view returned, through the database
+    # it routes to now (a replica for the viewsets)
+    queryset = queryset.using(queryset.db)
+    response = StreamingHttpResponse(
+        export_content(queryset, representation, export_format),
+        content_type=EXPORT_CONTENT_TYPES[export_format],
+    )
+    response["Content-Disposition"] = (
+        f'attachment; filename="{filename}.{export_format}"'
+    )
+    return response
@@ -0,0 +1,72 @@
+from library_service.query_params import params_to_list
+
+
+FIELDS_QUERY_PARAM = "fields"
+OMIT_QUERY_PARAM = "omit"
+
+
+def sparse_fields_requested(request):
+    return bool(
+        request.query_params.get(FIELDS_QUERY_PARAM)
+        or request.query_params.get(OMIT_QUERY_PARAM)
+    )
+
+
+def requested_fields(request, available):
+    """Names of `available` kept by the ?fields= and ?omit= params"""
+    fields = params_to_list(request.query_params.get(FIELDS_QUERY_PARAM))
+    omit = params_to_list(request.query_params.get(OMIT_QUERY_PARAM))
+    return [
+        name for name in available
+        if (not fields or name in fields) and name not in omit
+    ]
+
+
+class SparseFieldsSerializerMixin:
+    """
+    Drop the serializer fields not asked for with ?fields=a,b or
+    excluded with ?omit=c of the request in the serializer context.
+
+    `Meta.sparse_sources` maps fields that are not model columns to the
+    columns they are computed from, see `sparse_queryset`.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get("request")
+        if request is None or not sparse_fields_requested(request):
+            return
+
+        keep = set(requested_fields(request, self.fields))
+        for name in list(self.fields):
+            if name not in keep:
+                self.fields.pop(name)
+
+
+def sparse_queryset(queryset, serializer_class, request, extra=()):
+    """
+    Narrow `queryset` with only() to the columns the sparse serializer
+    needs, plus the primary key, the ordering columns and `extra`.
+    """
+    if not (
+        issubclass(serializer_class, SparseFieldsSerializerMixin)
+        and sparse_fields_requested(request)
+    ):
+        return queryset
+
+    opts = queryset.model._meta
+    model_fields = {field.name for field in opts.concrete_fields}
+    sources = getattr(serializer_class.Meta, "sparse_sources", {})
+    serializer = serializer_class(context={"request": request})
+
+    columns = {opts.pk.name, *extra}
+    for name in serializer.fields:
+        columns.update(
+            sources.get(name, (name,) if name in model_fields else ())
+        )
+    ordering = queryset.query.order_by or opts.ordering
+    columns.update(
+        field.lstrip("-") for field in ordering
+        if field.lstrip("-") in model_fields
+    )
+    return queryset.only(*columns)
@@ -1,16 +1,34 @@
 import os
 
+from django.conf import settings
+from django.utils.module_loading import import_string
 from notifiers import get_notifier
 from dotenv import load_dotenv
 
 
 load_dotenv()
 
+# Messages "sent" through LocmemBackend, for tests and offline runs.
+outbox = []
+
+
+class TelegramBackend:
+    def send(self, message: str):
+        telegram = get_notifier("telegram")
+        telegram.notify(
+            token=os.getenv("TOKEN"),
+            chat_id=os.getenv("CHATID"),
+            message=message,
+            raise_on_errors=True,
+        )
+
+
+class LocmemBackend:
+    def send(self, message: str):
+        outbox.append(message)
+
 
 def notification(message: str):
-    telegram = get_notifier("telegram")
-    telegram.notify(
-        token=os.getenv("TOKEN"),
-        chat_id=os.getenv("CHATID"),
-        message=message,
-    )
+    """Send a message right away through settings.NOTIFICATION_BACKEND"""
+    backend = import_string(settings.NOTIFICATION_BACKEND)()
+    backend.send(message)
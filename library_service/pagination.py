@@ -0,0 +1,227 @@
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.core.paginator import InvalidPage
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """
+    Forward-only cursor pagination over a fixed ordering of model fields.
+
+    The cursor holds the ordering values of the last row of the previous
+    page, so each page is one range query on the ordering columns:
+    no COUNT(*) and no OFFSET, whatever the depth.
+    """
+
+    cursor_query_param = "cursor"
+    invalid_cursor_message = "Invalid cursor"
+
+    def __init__(self, ordering, page_size):
+        self.ordering = tuple(ordering)
+        self.page_size = page_size
+
+    @staticmethod
+    def _split(field):
+        if field.startswith("-"):
+            return field[1:], "lt"
+        return field, "gt"
+
+    def encode_cursor(self, instance):
+        """Cursor after `instance`, a model instance or a values() row"""
+        names = [self._split(field)[0] for field in self.ordering]
+        if isinstance(instance, dict):
+            values = [instance[name] for name in names]
+        else:
+            values = [getattr(instance, name) for name in names]
+        raw = json.dumps(values, default=str).encode()
+        return base64.urlsafe_b64encode(raw).decode()
+
+    def decode_cursor(self, encoded, model):
+        """Ordering values of a cursor, converted by the model fields"""
+        try:
+            values = json.loads(base64.urlsafe_b64decode(encoded.encode()))
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(values, list) or len(values) != len(self.ordering):
+            raise NotFound(self.invalid_cursor_message)
+
+        converted = []
+        for field, value in zip(self.ordering, values):
+            field = model._meta.get_field(self._split(field)[0])
+            try:
+                value = field.to_python(value)
+            except (ValidationError, TypeError, ValueError):
+                raise NotFound(self.invalid_cursor_message)
+            if value is None:
+                raise NotFound(self.invalid_cursor_message)
+            converted.append(value)
+        return converted
+
+    def after_cursor(self, values):
+        """Build the row-value comparison `(a, b, ...) > (x, y, ...)`"""
+        condition = Q()
+        for position, field in enumerate(self.ordering):
+            name, lookup = self._split(field)
+            equal = {
+                self._split(previous)[0]: value
+                for previous, value in zip(
+                    self.ordering[:position], values[:position]
+                )
+            }
+            condition |= Q(**equal, **{f"{name}__{lookup}": values[position]})
+        return condition
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(
+                self.after_cursor(
+                    self.decode_cursor(encoded, queryset.model)
+                )
+            )
+
+        return self.set_page(list(queryset[:self.page_size + 1]))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """paginate_queryset() through the async ORM"""
+        self.request = request
+        queryset = queryset.order_by(*self.ordering)
+
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded:
+            queryset = queryset.filter(
+                self.after_cursor(
+                    self.decode_cursor(encoded, queryset.model)
+                )
+            )
+
+        return self.set_page(
+            [row async for row in queryset[:self.page_size + 1]]
+        )
+
+    def set_page(self, rows):
+        self.page = rows[:self.page_size]
+        self.has_next = len(rows) > self.page_size
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        url = remove_query_param(self.request.build_absolute_uri(), "page")
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(self.page[-1])
+        )
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_link(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+
+class PageNumberOrKeysetPagination(PageNumberPagination):
+    """
+    Page number pagination with an opt-in keyset mode.
+
+    Clients switch to keyset pagination with ?pagination=cursor and then
+    follow the returned `next` links (?cursor=...).
+    """
+
+    page_size = 5
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    keyset_ordering = ("id",)
+    mode_query_param = "pagination"
+
+    def use_keyset(self, request):
+        return (
+            KeysetPagination.cursor_query_param in request.query_params
+            or request.query_params.get(self.mode_query_param) == "cursor"
+        )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination(
+                self.keyset_ordering, self.get_page_size(request)
+            )
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        """
+        paginate_queryset() through the async ORM: the COUNT and the
+        page slice are awaited instead of run by the Django paginator
+        """
+        self.keyset = None
+        if self.use_keyset(request):
+            self.keyset = KeysetPagination(
+                self.keyset_ordering, self.get_page_size(request)
+            )
+            return await self.keyset.apaginate_queryset(
+                queryset, request, view
+            )
+
+        page_size = self.get_page_size(request)
+        if not page_size:
+            return None
+
+        paginator = self.django_paginator_class(queryset, page_size)
+        paginator.count = await queryset.acount()
+        page_number = self.get_page_number(request, paginator)
+        try:
+            number = paginator.validate_number(page_number)
+        except InvalidPage as exc:
+            raise NotFound(
+                self.invalid_page_message.format(
+                    page_number=page_number, message=str(exc)
+                )
+            )
+
+        bottom = (number - 1) * page_size
+        top = bottom + page_size
+        if top + paginator.orphans >= paginator.count:
+            top = paginator.count
+        rows = [row async for row in queryset[bottom:top]]
+        self.page = paginator._get_page(rows, number, paginator)
+        self.request = request
+        return rows
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_schema_operation_parameters(self, view):
+        return super().get_schema_operation_parameters(view) + [
+            {
+                "name": self.mode_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Set to `cursor` for keyset pagination.",
+                "schema": {"type": "string", "enum": ["cursor"]},
+            },
+            {
+                "name": KeysetPagination.cursor_query_param,
+                "required": False,
+                "in": "query",
+                "description": "Keyset pagination cursor.",
+                "schema": {"type": "string"},
+            },
+        ]
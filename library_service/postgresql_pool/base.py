@@ -0,0 +1,62 @@
+from functools import partial
+
+import psycopg2
+from django.db.backends.postgresql import base
+
+from library_service.db_pool import get_pool
+
+
+def reset_connection(connection):
+    """Roll back what a connection left open, False if it is broken"""
+    if connection.closed:
+        return False
+    idle = psycopg2.extensions.TRANSACTION_STATUS_IDLE
+    try:
+        if connection.get_transaction_status() != idle:
+            connection.rollback()
+    except psycopg2.Error:
+        return False
+    return connection.get_transaction_status() == idle
+
+
+def ping_connection(connection):
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT 1")
+    except psycopg2.Error:
+        return False
+    return reset_connection(connection)
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    PostgreSQL backend taking its connections from a process-wide
+    ConnectionPool (see library_service.db_pool) and giving them back
+    when Django closes them, at the end of each request or task with
+    CONN_MAX_AGE = 0. With CONN_HEALTH_CHECKS pooled connections are
+    checked before being handed out.
+    """
+
+    @property
+    def pool(self):
+        return get_pool(self.alias, self.settings_dict)
+
+    def get_new_connection(self, conn_params):
+        connection = self.pool.acquire(
+            partial(super().get_new_connection, conn_params),
+            check=(
+                ping_connection
+                if self.settings_dict["CONN_HEALTH_CHECKS"]
+                else reset_connection
+            ),
+        )
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            self.pool.release(
+                self.connection, reusable=reset_connection(self.connection)
+            )
@@ -0,0 +1,14 @@
+from rest_framework.exceptions import ValidationError
+
+
+def params_to_ints(qs):
+    """Converts a comma separated string of IDs to a list of integers"""
+    try:
+        return [int(str_id) for str_id in qs.split(",")]
+    except ValueError:
+        raise ValidationError(f"Expected comma separated ids, got: {qs}")
+
+
+def params_to_list(qs):
+    """Converts a comma separated string to a list of non-empty values"""
+    return [value for value in (qs or "").split(",") if value]
@@ -0,0 +1,40 @@
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+from rest_framework.renderers import JSONRenderer
+
+
+class ORJSONRenderer(JSONRenderer):
+    """
+    JSONRenderer producing the same bytes with orjson.
+
+    Values orjson does not know, like Decimal, and datetimes go through
+    DRF's encoder as with the stdlib renderer. Indented output (the
+    browsable API) and installs without orjson use the stdlib renderer.
+    """
+
+    options = (
+        orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+        if orjson is not None else 0
+    )
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b""
+
+        renderer_context = renderer_context or {}
+        if orjson is None or self.get_indent(
+            accepted_media_type, renderer_context
+        ):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = orjson.dumps(
+            data, default=self.encoder_class().default, option=self.options
+        )
+        # Escaped by the stdlib renderer for embedding in JavaScript
+        if b"\xe2\x80\xa8" in ret or b"\xe2\x80\xa9" in ret:
+            ret = ret.replace(b"\xe2\x80\xa8", b"\\u2028")
+            ret = ret.replace(b"\xe2\x80\xa9", b"\\u2029")
+        return ret
@@ -0,0 +1,26 @@
+"""
+Settings to run the test suite against a primary and a replica with
+test databases of their own, in memory with SQLite, so the tests that tell
+replica reads apart from primary ones run as well:
+
+    python manage.py test --settings=library_service.replica_test_settings
+
+Nothing copies the primary to the replica, the tests write to both.
+"""
+
+from library_service.settings import *  # noqa: F401,F403
+from library_service.settings import BASE_DIR, SECRET_KEY
+
+SECRET_KEY = SECRET_KEY or "replica-test-settings"
+
+DATABASES = {
+    "default": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "db.sqlite3",
+    },
+    "replica": {
+        "ENGINE": "django.db.backends.sqlite3",
+        "NAME": BASE_DIR / "replica.sqlite3",
+    },
+}
+DATABASE_REPLICAS = ["replica"]
@@ -0,0 +1,116 @@
+import random
+from contextlib import contextmanager
+
+from asgiref.local import Local
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from django.utils.deprecation import MiddlewareMixin
+from rest_framework.permissions import SAFE_METHODS
+
+
+PRIMARY_PIN_KEY = "db:primary:{}"
+
+# Per request (thread or async task) routing state
+_state = Local()
+
+
+def set_replica_reads(enabled):
+    _state.replica_reads = enabled
+
+
+@contextmanager
+def replica_reads(enabled=True):
+    """
+    Send the reads of the block to a replica, if there is any, or to
+    the primary with `enabled=False`
+    """
+    previous = getattr(_state, "replica_reads", False)
+    set_replica_reads(enabled)
+    try:
+        yield
+    finally:
+        set_replica_reads(previous)
+
+
+def reading_from_replica():
+    """Whether the reads of the current request go to a replica"""
+    return bool(settings.DATABASE_REPLICAS) and getattr(
+        _state, "replica_reads", False
+    )
+
+
+def pin_to_primary(user):
+    """Read from the primary for a while, so `user` sees its own writes"""
+    if settings.DATABASE_REPLICAS and user and user.is_authenticated:
+        cache.set(
+            PRIMARY_PIN_KEY.format(user.pk),
+            True,
+            settings.REPLICA_PIN_SECONDS,
+        )
+
+
+def is_pinned_to_primary(user):
+    if not (user and user.is_authenticated):
+        return False
+    return cache.get(PRIMARY_PIN_KEY.format(user.pk), False)
+
+
+class PrimaryReplicaRouter:
+    """
+    Writes go to the primary, reads as well unless replica reads are on
+    (see ReplicaReadMixin and replica_reads()), then to a random one of
+    settings.DATABASE_REPLICAS.
+    """
+
+    def db_for_read(self, model, **hints):
+        if reading_from_replica():
+            return random.choice(settings.DATABASE_REPLICAS)
+        return None
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.DATABASE_REPLICAS}
+        if {obj1._state.db, obj2._state.db} <= databases:
+            return True
+        return None
+
+
+class ReadYourWritesMiddleware(MiddlewareMixin):
+    """Pin the user of a request that wrote anything to the primary"""
+
+    def process_request(self, request):
+        _state.wrote = False
+        # Left on by a view that raised before finalize_response()
+        set_replica_reads(False)
+
+    def process_response(self, request, response):
+        if getattr(_state, "wrote", False):
+            pin_to_primary(getattr(request, "user", None))
+        return response
+
+
+class ReplicaReadMixin:
+    """
+    Serve the safe-method requests of a view from a replica, except
+    for users pinned to the primary after a write.
+    """
+
+    def use_replica(self, request):
+        return (
+            bool(settings.DATABASE_REPLICAS)
+            and request.method in SAFE_METHODS
+            and not is_pinned_to_primary(request.user)
+        )
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        # After authentication, the pin is per user
+        set_replica_reads(self.use_replica(request))
+
+    def finalize_response(self, request, response, *args, **kwargs):
+        set_replica_reads(False)
+        return super().finalize_response(request, response, *args, **kwargs)
@@ -51,10 +51,12 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     "django.middleware.security.SecurityMiddleware",
+    "library_service.db_pool.ConnectionStatsMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "library_service.routers.ReadYourWritesMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
@@ -91,9 +93,86 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
         "HOST": os.getenv("POSTGRES_HOST"),
         "PORT": os.getenv("POSTGRES_PORT"),
+        # Seconds a connection is kept for the next requests of the same
+        # thread, 0 closes it at the end of each request. asgi.py defaults
+        # it to 0: under ASGI each request runs in its own thread, so a
+        # kept connection is never reused and stays open until the thread
+        # is gone. Set DB_POOL_SIZE to reuse connections there.
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", 60)),
+        # Check a kept connection still works before reusing it
+        "CONN_HEALTH_CHECKS": (
+            os.getenv("DB_CONN_HEALTH_CHECKS", "true") == "true"
+        ),
     }
 }
 
+# Share at most DB_POOL_SIZE connections between the threads, or the
+# eventlet green threads of Celery, of each process instead of keeping
+# one per thread. Connections go back to the pool after each request.
+if int(os.getenv("DB_POOL_SIZE", 0)):
+    DATABASES["default"].update({
+        "ENGINE": "library_service.postgresql_pool",
+        "CONN_MAX_AGE": 0,
+        "POOL_SIZE": int(os.getenv("DB_POOL_SIZE")),
+        # Seconds to wait for a free connection
+        "POOL_TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", 10)),
+        # Seconds before a connection is closed and replaced
+        "POOL_MAX_LIFETIME": int(os.getenv("DB_POOL_MAX_LIFETIME", 30 * 60)),
+    })
+
+# Read replicas of the default database, one alias per host, with its
+# name and credentials. Safe-method book and borrowing requests and the
+# exports read from them, see library_service.routers.
+for number, host in enumerate(
+    filter(None, os.getenv("POSTGRES_REPLICA_HOSTS", "").split(",")),
+    start=1,
+):
+    DATABASES[f"replica_{number}"] = {
+        **DATABASES["default"],
+        "HOST": host.strip(),
+        "TEST": {"MIRROR": "default"},
+    }
+
+DATABASE_REPLICAS = [alias for alias in DATABASES if alias != "default"]
+DATABASE_ROUTERS = ["library_service.routers.PrimaryReplicaRouter"]
+# Seconds a user reads from the primary after writing, longer than the
+# replication lag
+REPLICA_PIN_SECONDS = int(os.getenv("REPLICA_PIN_SECONDS", 5))
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+
+if os.getenv("CACHE_REDIS_URL"):
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": os.getenv("CACHE_REDIS_URL"),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+        }
+    }
+
+# Seconds a cached book list/detail response is kept, catalog writes
+# invalidate it earlier.
+BOOK_CACHE_TIMEOUT = int(os.getenv("BOOK_CACHE_TIMEOUT", 10 * 60))
+
+# Rows fetched per server-side cursor round trip by the exports
+EXPORT_CHUNK_SIZE = int(os.getenv("EXPORT_CHUNK_SIZE", 2000))
+
+# Book imports validate and write rows in batches of this size
+BOOK_IMPORT_BATCH_SIZE = int(os.getenv("BOOK_IMPORT_BATCH_SIZE", 1000))
+# Per-row errors kept in an import report, the rest are only counted
+BOOK_IMPORT_MAX_ERRORS = int(os.getenv("BOOK_IMPORT_MAX_ERRORS", 100))
+
+# Serve book and borrowing list/retrieve from values() rows,
+# see library_service.values
+VALUES_READ_PATH = os.getenv("VALUES_READ_PATH", "true") == "true"
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -143,15 +222,29 @@ DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 REST_FRAMEWORK = {
     "DEFAULT_SCHEMA_CLASS": "drf_spectacular.openapi.AutoSchema",
     "DEFAULT_AUTHENTICATION_CLASSES": (
-        "rest_framework_simplejwt.authentication.JWTAuthentication",
+        "user.authentication.CachedJWTAuthentication",
+    ),
+    "DEFAULT_RENDERER_CLASSES": (
+        "library_service.renderers.ORJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ),
+    "DEFAULT_PARSER_CLASSES": (
+        "library_service.parsers.ORJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ),
     "DEFAULT_THROTTLE_CLASSES": [
-        "rest_framework.throttling.AnonRateThrottle",
-        "rest_framework.throttling.UserRateThrottle",
+        "library_service.throttling.AnonSlidingWindowThrottle",
+        "library_service.throttling.UserSlidingWindowThrottle",
+        "library_service.throttling.ScopedSlidingWindowThrottle",
     ],
     "DEFAULT_THROTTLE_RATES": {
         "anon": "100/day",
         "user": "100/day",
+        # Per view `throttle_scope`
+        "books": os.getenv("THROTTLE_RATE_BOOKS", "600/minute"),
+        "borrowings": os.getenv("THROTTLE_RATE_BORROWINGS", "300/minute"),
+        "token": os.getenv("THROTTLE_RATE_TOKEN", "20/minute"),
     },
 }
 
@@ -173,8 +266,28 @@ SIMPLE_JWT = {
     ),  # default = 5 min
     "REFRESH_TOKEN_LIFETIME": timedelta(days=1),  # default = 1 day
     "ROTATE_REFRESH_TOKENS": True,  # will return also new refresh token  (default = False)
+    "TOKEN_OBTAIN_SERIALIZER": (
+        "user.serializers.ClaimsTokenObtainPairSerializer"
+    ),
+    "TOKEN_REFRESH_SERIALIZER": (
+        "user.serializers.ClaimsTokenRefreshSerializer"
+    ),
 }
 
+# Throttling counters are shared through this Redis, per process without
+THROTTLE_REDIS_URL = (
+    os.getenv("THROTTLE_REDIS_URL") or os.getenv("CACHE_REDIS_URL")
+)
+# Seconds to wait for the throttling Redis, and before trying it again
+# once it failed, counting locally meanwhile
+THROTTLE_REDIS_TIMEOUT = float(os.getenv("THROTTLE_REDIS_TIMEOUT", 0.05))
+THROTTLE_REDIS_RETRY = int(os.getenv("THROTTLE_REDIS_RETRY", 5))
+
+# Seconds a JWT user is cached, saving and deleting the user drops it
+AUTH_USER_CACHE_TIMEOUT = int(os.getenv("AUTH_USER_CACHE_TIMEOUT", 60))
+# Build request.user from the token claims, without any query
+JWT_USER_FROM_CLAIMS = os.getenv("JWT_USER_FROM_CLAIMS") == "true"
+
 # Celery Configuration Options
 
 CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL")
@@ -182,3 +295,40 @@ CELERY_RESULT_BACKEND = os.getenv("CELERY_RESULT_BACKEND")
 CELERY_TIMEZONE = "Europe/Kiev"
 CELERY_TASK_TRACK_STARTED = True
 CELERY_TASK_TIME_LIMIT = 30 * 60
+CELERY_BEAT_SCHEDULE = {
+    "deliver-notifications": {
+        "task": "borrowing.tasks.deliver_notifications",
+        "schedule": int(os.getenv("NOTIFICATION_OUTBOX_INTERVAL", 10)),
+    },
+}
+
+# Overdue borrowings are streamed and resolved in chunks of this size
+OVERDUE_CHUNK_SIZE = int(os.getenv("OVERDUE_CHUNK_SIZE", 2000))
+# "user" or "book" sends grouped digests instead of a message per borrowing
+OVERDUE_DIGEST_GROUP_BY = os.getenv("OVERDUE_DIGEST_GROUP_BY") or None
+OVERDUE_DIGEST_MAX_MESSAGES = 10
+# Split the overdue sweep into chord tasks over id ranges of this span
+OVERDUE_FAN_OUT = os.getenv("OVERDUE_FAN_OUT") == "true"
+OVERDUE_FAN_OUT_CHUNK_SIZE = int(
+    os.getenv("OVERDUE_FAN_OUT_CHUNK_SIZE", 20000)
+)
+# Only process borrowings that became overdue since the last run, and
+# remind about still overdue ones every N days (0 disables reminders)
+OVERDUE_INCREMENTAL = os.getenv("OVERDUE_INCREMENTAL") == "true"
+OVERDUE_REMINDER_INTERVAL_DAYS = int(
+    os.getenv("OVERDUE_REMINDER_INTERVAL_DAYS", 7)
+)
+
+# Notifications
+
+# "library_service.notification.LocmemBackend" keeps messages in memory
+NOTIFICATION_BACKEND = os.getenv(
+    "NOTIFICATION_BACKEND", "library_service.notification.TelegramBackend"
+)
+# Telegram sendMessage text limit
+NOTIFICATION_MESSAGE_LIMIT = 4096
+NOTIFICATION_OUTBOX_BATCH_SIZE = 50
+NOTIFICATION_OUTBOX_MAX_ATTEMPTS = 8
+# Seconds before the first retry, doubled on every further attempt
+NOTIFICATION_OUTBOX_RETRY_DELAY = 30
+NOTIFICATION_OUTBOX_MAX_RETRY_DELAY = 60 * 60
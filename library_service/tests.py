@@ -0,0 +1,272 @@
+import threading
+import time
+from datetime import date
+from unittest import mock, skipUnless
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import SimpleTestCase, TestCase, override_settings
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from book.cache import cache_stats
+from book.models import Book
+from book.tests.test_book_api import (
+    ASYNC_BOOK_URL,
+    BOOK_URL,
+    EXPORT_URL,
+    sample_book,
+)
+from book.views import BookViewSet
+from borrowing.tests.tests_borrowing_api import BORROWING_URL
+from library_service.db_pool import (
+    ConnectionPool,
+    PoolTimeout,
+    connection_stats,
+)
+from library_service.routers import PrimaryReplicaRouter, replica_reads
+from user.tests import ME_URL
+
+
+# A replica with a test database of its own, to tell the reads apart
+REPLICA = next(
+    (
+        alias
+        for alias in settings.DATABASE_REPLICAS
+        if not settings.DATABASES[alias].get("TEST", {}).get("MIRROR")
+    ),
+    None,
+)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def setUp(self):
+        self.pool = ConnectionPool(size=2, timeout=0.05, max_lifetime=60)
+
+    def test_released_connection_is_reused(self):
+        connection = self.pool.acquire(FakeConnection)
+        self.pool.release(connection)
+
+        self.assertIs(self.pool.acquire(FakeConnection), connection)
+        stats = self.pool.get_stats()
+        self.assertEqual((stats["opened"], stats["reused"]), (1, 1))
+        self.assertEqual((stats["open"], stats["in_use"]), (1, 1))
+
+    def test_full_pool_waits_then_times_out(self):
+        first = self.pool.acquire(FakeConnection)
+        self.pool.acquire(FakeConnection)
+        threading.Timer(0.01, self.pool.release, [first]).start()
+
+        self.assertIs(self.pool.acquire(FakeConnection), first)
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire(FakeConnection)
+        stats = self.pool.get_stats()
+        self.assertEqual(stats["opened"], 2)
+        self.assertEqual(stats["timeouts"], 1)
+        self.assertGreaterEqual(stats["waits"], 1)
+
+    def test_unusable_connections_are_closed(self):
+        broken = self.pool.acquire(FakeConnection)
+        self.pool.release(broken)
+        failed_check = self.pool.acquire(
+            FakeConnection, check=lambda connection: False
+        )
+        self.pool.release(failed_check, reusable=False)
+
+        self.assertIsNot(failed_check, broken)
+        self.assertTrue(broken.closed)
+        self.assertTrue(failed_check.closed)
+        self.assertEqual(self.pool.get_stats()["open"], 0)
+
+    def test_old_connections_are_replaced(self):
+        connection = self.pool.acquire(FakeConnection)
+        with mock.patch.object(
+            time, "monotonic", return_value=time.monotonic() + 61
+        ):
+            self.pool.release(connection)
+
+        self.assertTrue(connection.closed)
+        self.assertIsNot(self.pool.acquire(FakeConnection), connection)
+
+    def test_failed_connect_frees_its_slot(self):
+        def connect():
+            raise OSError("refused")
+
+        for _ in range(3):
+            with self.assertRaises(OSError):
+                self.pool.acquire(connect)
+
+        self.assertEqual(self.pool.get_stats()["open"], 0)
+        self.pool.acquire(FakeConnection)
+        self.pool.acquire(FakeConnection)
+
+    def test_connection_stats_without_pool(self):
+        stats = connection_stats()["default"]
+
+        self.assertFalse(stats["pool"])
+        self.assertIn("conn_max_age", stats)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class ConnectionStatsTests(TestCase):
+    def test_opened_and_reused_connections_counted(self):
+        before = connection_stats()["default"]
+        connection_created.send(
+            sender=connection.__class__, connection=connection
+        )
+        # The test case keeps the connection open between requests
+        for _ in range(2):
+            self.client.get(BOOK_URL)
+
+        after = connection_stats()["default"]
+        self.assertEqual(after["opened"] - before["opened"], 1)
+        self.assertEqual(after["reused"] - before["reused"], 2)
+
+
+@override_settings(DATABASE_REPLICAS=["replica"])
+class PrimaryReplicaRouterTests(SimpleTestCase):
+    def test_reads_go_to_replica_only_when_asked(self):
+        router = PrimaryReplicaRouter()
+
+        self.assertIsNone(router.db_for_read(Book))
+        with replica_reads():
+            self.assertEqual(router.db_for_read(Book), "replica")
+            self.assertEqual(router.db_for_write(Book), "default")
+        self.assertIsNone(router.db_for_read(Book))
+
+
+# "default" stands in for the replica: the router returns it for
+# replica reads and None for the primary
+@override_settings(DATABASE_REPLICAS=["default"])
+class ReplicaReadTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "user12345"
+        )
+        self.client.force_authenticate(self.user)
+        sample_book()
+        cache.clear()
+
+    def routed_reads(self, request, *args, **kwargs):
+        """Response of the request, and the databases of its reads"""
+        databases = []
+        db_for_read = PrimaryReplicaRouter.db_for_read
+
+        def spy(router, model, **hints):
+            databases.append(db_for_read(router, model, **hints))
+            return databases[-1]
+
+        with mock.patch.object(PrimaryReplicaRouter, "db_for_read", spy):
+            response = request(*args, **kwargs)
+        return response, set(databases)
+
+    def test_safe_requests_read_from_replica_until_user_writes(self):
+        _, borrowing_reads = self.routed_reads(
+            self.client.get, BORROWING_URL
+        )
+        res, checkout_reads = self.routed_reads(
+            self.client.post,
+            BORROWING_URL,
+            {"book_id": 1, "expected_return_date": date.today()},
+        )
+        _, pinned_reads = self.routed_reads(self.client.get, BORROWING_URL)
+
+        self.assertEqual(borrowing_reads, {"default"})
+        self.assertEqual(res.status_code, 201)
+        self.assertEqual(checkout_reads, {None})
+        self.assertEqual(pinned_reads, {None})
+
+    def test_checkout_pins_only_its_user_to_primary(self):
+        other = APIClient()
+        other.force_authenticate(
+            get_user_model().objects.create_user(
+                "other@user.com", "other12345"
+            )
+        )
+        self.client.post(
+            BORROWING_URL,
+            {"book_id": 1, "expected_return_date": date.today()},
+        )
+
+        _, other_reads = self.routed_reads(other.get, BORROWING_URL)
+        _, own_reads = self.routed_reads(self.client.get, BORROWING_URL)
+
+        self.assertEqual(own_reads, {None})
+        self.assertEqual(other_reads, {"default"})
+
+    def test_failed_replica_read_does_not_leak_into_next_request(self):
+        with mock.patch.object(
+            BookViewSet, "list", side_effect=RuntimeError("replica down")
+        ):
+            with self.assertRaises(RuntimeError):
+                self.client.get(BOOK_URL)
+
+        _, reads = self.routed_reads(self.client.get, ME_URL)
+
+        self.assertEqual(reads, {None})
+
+    def test_book_responses_cached_from_primary(self):
+        _, miss_reads = self.routed_reads(self.client.get, BOOK_URL)
+        _, hit_reads = self.routed_reads(self.client.get, BOOK_URL)
+
+        self.assertEqual(miss_reads, {None})
+        self.assertEqual(hit_reads, set())
+        self.assertEqual(cache_stats()["hits"], 1)
+
+
+@skipUnless(REPLICA, "Needs a replica that is not a test mirror")
+class ReplicaDatabaseTests(TestCase):
+    databases = {"default", REPLICA} - {None}
+
+    def setUp(self):
+        self.client = APIClient()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com", "user12345", is_staff=True
+        )
+        self.client.force_authenticate(self.user)
+        sample_book(title="Primary")
+        Book.objects.using(REPLICA).create(
+            title="Replica", author="Oleg", cover="Soft", inventory=2,
+            daily_fee=1,
+        )
+        cache.clear()
+
+    def test_reads_see_replica_and_writes_pin_primary(self):
+        # Cached, so built from the primary
+        cached = self.client.get(BOOK_URL).data["results"]
+        exported = b"".join(self.client.get(EXPORT_URL).streaming_content)
+        self.client.post(
+            BORROWING_URL,
+            {"book_id": 1, "expected_return_date": date.today()},
+        )
+        pinned = self.client.get(BORROWING_URL).data["results"]
+
+        self.assertEqual([book["title"] for book in cached], ["Primary"])
+        self.assertIn(b"Replica", exported)
+        self.assertEqual(len(pinned), 1)
+
+    def test_async_reads_see_replica(self):
+        token = AccessToken.for_user(self.user)
+
+        async def get():
+            return await self.async_client.get(
+                ASYNC_BOOK_URL, AUTHORIZATION=f"Bearer {token}"
+            )
+
+        listed = async_to_sync(get)().json()["results"]
+
+        self.assertEqual([book["title"] for book in listed], ["Replica"])
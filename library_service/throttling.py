@@ -0,0 +1,230 @@
+import logging
+import threading
+import time
+from collections import Counter
+
+import redis
+from django.conf import settings
+from django.core.cache import cache
+from django.core.cache.backends.locmem import LocMemCache
+from rest_framework.throttling import SimpleRateThrottle
+
+
+logger = logging.getLogger(__name__)
+
+STATS_KEY = "throttle:stats"
+
+# Sliding window counter: the count of the current fixed window plus
+# the count of the previous one weighted by how much of it is still
+# inside the sliding window. Two GETs and an INCR, whatever the rate.
+#   KEYS: current window, previous window, stats hash
+#   ARGV: limit, weight of the previous window, ttl, scope
+SLIDING_WINDOW_SCRIPT = """
+local current = tonumber(redis.call("GET", KEYS[1]) or "0")
+local previous = tonumber(redis.call("GET", KEYS[2]) or "0")
+if previous * tonumber(ARGV[2]) + current >= tonumber(ARGV[1]) then
+    redis.call("HINCRBY", KEYS[3], "throttled:" .. ARGV[4], 1)
+    return {0, current, previous}
+end
+current = redis.call("INCR", KEYS[1])
+if current == 1 then
+    redis.call("EXPIRE", KEYS[1], ARGV[3])
+end
+redis.call("HINCRBY", KEYS[3], "allowed:" .. ARGV[4], 1)
+return {1, current, previous}
+"""
+
+
+def throttle_redis_url():
+    return settings.THROTTLE_REDIS_URL
+
+
+class LocalWindows:
+    """
+    In-process sliding window counters, used without Redis and while
+    it is unreachable. Limits then apply per process.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = Counter()
+        # Stays the default cache unless Redis is configured, so
+        # clearing the cache also resets these counters
+        self.store = cache
+        if throttle_redis_url():
+            self.store = LocMemCache("throttle", {})
+
+    def hit(self, keys, limit, weight, ttl, scope):
+        with self.lock:
+            values = self.store.get_many(keys[:2])
+            current = values.get(keys[0], 0)
+            previous = values.get(keys[1], 0)
+            if previous * weight + current >= limit:
+                self.stats[f"throttled:{scope}"] += 1
+                return False, current, previous
+            current += 1
+            self.store.set(keys[0], current, ttl)
+            self.stats[f"allowed:{scope}"] += 1
+            return True, current, previous
+
+
+class SlidingWindows:
+    """Shared sliding window counters in Redis, falling back to local"""
+
+    def __init__(self):
+        self.local = LocalWindows()
+        self.client = self.script = None
+        self.redis_errors = 0
+        self.retry_at = 0
+        url = throttle_redis_url()
+        if url:
+            self.client = redis.Redis.from_url(
+                url,
+                socket_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+                socket_connect_timeout=settings.THROTTLE_REDIS_TIMEOUT,
+            )
+            self.script = self.client.register_script(SLIDING_WINDOW_SCRIPT)
+
+    @property
+    def backend(self):
+        return "redis" if self.client is not None else "local"
+
+    def hit(self, key, limit, duration, scope, now=None):
+        """
+        Count a request against `limit` per `duration` seconds.
+        Returns whether it is allowed and, if not, the seconds to wait.
+        """
+        now = time.time() if now is None else now
+        window, elapsed = divmod(now, duration)
+        keys = [f"{key}:{int(window)}", f"{key}:{int(window) - 1}"]
+        weight = 1 - elapsed / duration
+
+        allowed = None
+        if self.script is not None and now >= self.retry_at:
+            try:
+                allowed, current, previous = self.script(
+                    keys=[*keys, STATS_KEY],
+                    args=[limit, weight, duration * 2, scope],
+                )
+            except redis.RedisError:
+                self.redis_errors += 1
+                self.retry_at = now + settings.THROTTLE_REDIS_RETRY
+                logger.exception("Throttle Redis unavailable, using local")
+        if allowed is None:
+            allowed, current, previous = self.local.hit(
+                keys, limit, weight, duration * 2, scope
+            )
+        if allowed:
+            return True, None
+
+        if current >= limit or not previous:
+            return False, duration - elapsed
+        # When the previous window weighs little enough to let one in
+        free_at = duration * (1 - (limit - current) / previous)
+        return False, max(free_at - elapsed, 0)
+
+    def stats(self):
+        counts = Counter(self.local.stats)
+        if self.client is not None:
+            try:
+                counts.update({
+                    name.decode(): int(value)
+                    for name, value in self.client.hgetall(STATS_KEY).items()
+                })
+            except redis.RedisError:
+                self.redis_errors += 1
+        scopes = {}
+        for name, value in counts.items():
+            outcome, scope = name.split(":", 1)
+            scopes.setdefault(scope, {"allowed": 0, "throttled": 0})
+            scopes[scope][outcome] += value
+        return {
+            "backend": self.backend,
+            "redis_errors": self.redis_errors,
+            "scopes": scopes,
+        }
+
+
+_windows = None
+
+
+def get_windows():
+    global _windows
+    if _windows is None:
+        _windows = SlidingWindows()
+    return _windows
+
+
+def throttle_stats():
+    return get_windows().stats()
+
+
+class SlidingWindowRateThrottle(SimpleRateThrottle):
+    """
+    SimpleRateThrottle on shared sliding window counters: O(1) per
+    request instead of rewriting a list of request timestamps, and
+    enforced across processes when THROTTLE_REDIS_URL is set.
+    """
+
+    cache_format = "throttle:%(scope)s:%(ident)s"
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        allowed, self.wait_seconds = get_windows().hit(
+            self.key, self.num_requests, self.duration, self.scope
+        )
+        return allowed
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class AnonSlidingWindowThrottle(SlidingWindowRateThrottle):
+    """Limit anonymous requests by IP address"""
+
+    scope = "anon"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.cache_format % {
+            "scope": self.scope,
+            "ident": self.get_ident(request),
+        }
+
+
+class UserSlidingWindowThrottle(SlidingWindowRateThrottle):
+    """Limit requests by user, or by IP address when anonymous"""
+
+    scope = "user"
+
+    def get_cache_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        return self.cache_format % {"scope": self.scope, "ident": ident}
+
+
+class ScopedSlidingWindowThrottle(UserSlidingWindowThrottle):
+    """Limit views with a `throttle_scope`, with that scope's rate"""
+
+    scope_attr = "throttle_scope"
+
+    def __init__(self):
+        # The scope, and so the rate, comes from the view
+        pass
+
+    def allow_request(self, request, view):
+        self.scope = getattr(view, self.scope_attr, None)
+        if not self.scope:
+            return True
+        self.rate = self.get_rate()
+        self.num_requests, self.duration = self.parse_rate(self.rate)
+        return super().allow_request(request, view)
@@ -21,11 +21,14 @@ from drf_spectacular.views import (
     SpectacularRedocView,
 )
 
+from library_service.views import StatsView
+
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("api/user/", include("user.urls", namespace="user")),
     path("api/book/", include("book.urls", namespace="book")),
     path("api/borrowing/", include("borrowing.urls", namespace="borrowing")),
+    path("api/stats/", StatsView.as_view(), name="stats"),
     path("api/doc/", SpectacularAPIView.as_view(), name="schema"),
     path(
         "api/doc/swagger/",
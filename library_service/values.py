@@ -0,0 +1,200 @@
+from operator import itemgetter
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
+from django.http import Http404
+from rest_framework import fields as drf_fields
+from rest_framework.generics import get_object_or_404
+from rest_framework.response import Response
+from rest_framework.settings import api_settings
+
+
+# DRF fields whose output is the database value itself
+PASSTHROUGH_FIELDS = (
+    drf_fields.IntegerField,
+    drf_fields.CharField,
+    drf_fields.ChoiceField,
+)
+
+
+class NotCompilable(Exception):
+    pass
+
+
+def _column_getter(column, convert):
+    if convert is None:
+        return itemgetter(column)
+
+    def getter(row):
+        value = row[column]
+        return None if value is None else convert(value)
+
+    return getter
+
+
+def _field_converter(field):
+    """Converter of a non-null column value, None when used as is"""
+    if type(field) in PASSTHROUGH_FIELDS:
+        return None
+    if type(field) is drf_fields.DateField:
+        output_format = getattr(field, "format", api_settings.DATE_FORMAT)
+        if output_format and output_format.lower() == drf_fields.ISO_8601:
+            return lambda value: value.isoformat()
+    return field.to_representation
+
+
+class ValuesRepresentation:
+    """
+    Output of a model serializer precompiled into one getter per field,
+    applied to the rows of a values() queryset.
+
+    Model fields are read from their column and converted like the DRF
+    field would; other fields need a converter of the whole row in
+    `Meta.value_converters`, reading the columns listed for them in
+    `Meta.sparse_sources`. Raises NotCompilable for anything else.
+    """
+
+    def __init__(self, serializer):
+        meta = serializer.Meta
+        opts = meta.model._meta
+        attnames = {
+            field.name: field.attname for field in opts.concrete_fields
+        }
+        converters = getattr(meta, "value_converters", {})
+        sources = getattr(meta, "sparse_sources", {})
+
+        self.columns = {opts.pk.attname}
+        self.getters = []
+        for name, field in serializer.fields.items():
+            if name in converters:
+                getter = converters[name]
+                self.columns.update(sources.get(name, ()))
+            elif field.source in attnames and not field.write_only:
+                column = attnames[field.source]
+                getter = _column_getter(column, _field_converter(field))
+                self.columns.add(column)
+            else:
+                raise NotCompilable(name)
+            if not field.write_only:
+                self.getters.append((name, getter))
+
+    def to_representation(self, row):
+        return {name: getter(row) for name, getter in self.getters}
+
+
+class ValuesReadMixin:
+    """
+    Serve list and retrieve from values() rows through a
+    ValuesRepresentation of the serializer instead of model instances
+    and field-by-field serialization, with the same JSON output.
+
+    Falls back to the serializer when VALUES_READ_PATH is off or the
+    serializer can not be compiled.
+    """
+
+    values_actions = ("list", "retrieve")
+
+    def get_values_representation(self):
+        if (
+            not settings.VALUES_READ_PATH
+            or self.action not in self.values_actions
+        ):
+            return None
+        try:
+            return ValuesRepresentation(self.get_serializer())
+        except NotCompilable:
+            return None
+
+    def get_values_columns(self, representation, queryset):
+        """The representation columns plus those of the page ordering"""
+        ordering = (
+            *(queryset.query.order_by or queryset.model._meta.ordering),
+            *getattr(self.paginator, "keyset_ordering", ()),
+        )
+        return representation.columns | {
+            field.lstrip("-") for field in ordering if isinstance(field, str)
+        }
+
+    def get_values_data(self, rows, representation):
+        return [representation.to_representation(row) for row in rows]
+
+    def list(self, request, *args, **kwargs):
+        representation = self.get_values_representation()
+        if representation is None:
+            return super().list(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values(
+            *self.get_values_columns(representation, queryset)
+        )
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                self.get_values_data(page, representation)
+            )
+        return Response(self.get_values_data(queryset, representation))
+
+    def retrieve(self, request, *args, **kwargs):
+        representation = self.get_values_representation()
+        if representation is None:
+            return super().retrieve(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        row = get_object_or_404(
+            queryset.values(
+                *self.get_values_columns(representation, queryset)
+            ),
+            **{self.lookup_field: self.kwargs[lookup_url_kwarg]},
+        )
+        self.check_object_permissions(request, row)
+        return Response(self.get_values_data([row], representation)[0])
+
+    # Async counterparts, served by library_service.async_views
+
+    async def aget_values_data(self, rows, representation):
+        return self.get_values_data(rows, representation)
+
+    async def apaginate_queryset(self, queryset):
+        if self.paginator is None:
+            return None
+        return await self.paginator.apaginate_queryset(
+            queryset, self.request, view=self
+        )
+
+    async def alist(self, request, *args, **kwargs):
+        representation = self.get_values_representation()
+        if representation is None:
+            return await sync_to_async(self.list)(request, *args, **kwargs)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        queryset = queryset.values(
+            *self.get_values_columns(representation, queryset)
+        )
+        page = await self.apaginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(
+                await self.aget_values_data(page, representation)
+            )
+        rows = [row async for row in queryset]
+        return Response(await self.aget_values_data(rows, representation))
+
+    async def aretrieve(self, request, *args, **kwargs):
+        representation = self.get_values_representation()
+        if representation is None:
+            return await sync_to_async(self.retrieve)(
+                request, *args, **kwargs
+            )
+
+        queryset = self.filter_queryset(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = await queryset.values(
+                *self.get_values_columns(representation, queryset)
+            ).aget(**{self.lookup_field: self.kwargs[lookup_url_kwarg]})
+        except (ObjectDoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(request, row)
+        data = await self.aget_values_data([row], representation)
+        return Response(data[0])
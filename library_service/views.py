@@ -0,0 +1,25 @@
+from drf_spectacular.types import OpenApiTypes
+from drf_spectacular.utils import extend_schema
+from rest_framework.permissions import IsAdminUser
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from book.cache import cache_stats
+from library_service.db_pool import connection_stats
+from library_service.throttling import throttle_stats
+
+
+class StatsView(APIView):
+    """Runtime counters of the service, staff only"""
+
+    permission_classes = (IsAdminUser,)
+
+    @extend_schema(responses=OpenApiTypes.OBJECT)
+    def get(self, request, *args, **kwargs):
+        return Response(
+            {
+                "book_cache": cache_stats(),
+                "throttle": throttle_stats(),
+                "database": connection_stats(),
+            }
+        )
@@ -0,0 +1,126 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import cached_property
+from django.utils.translation import gettext_lazy as _
+from drf_spectacular.contrib.rest_framework_simplejwt import SimpleJWTScheme
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import (
+    AuthenticationFailed,
+    InvalidToken,
+)
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.settings import api_settings
+
+
+USER_CACHE_KEY = "auth:user:{}"
+# Enough of a user for the views, nothing secret like the password hash
+USER_CACHE_FIELDS = ("id", "email", "is_staff", "is_active")
+
+
+def invalidate_cached_user(user_id):
+    cache.delete(USER_CACHE_KEY.format(user_id))
+
+
+class ClaimsUser(TokenUser):
+    """TokenUser with the `email` claim, shown like the User model"""
+
+    @cached_property
+    def email(self):
+        return self.token.get("email", "")
+
+    def __str__(self):
+        return self.email
+
+
+class CachedJWTAuthentication(JWTAuthentication):
+    """
+    JWTAuthentication without the user query on most requests.
+
+    The id, email, is_staff and is_active of the user of a token are
+    cached for settings.AUTH_USER_CACHE_TIMEOUT seconds and dropped when
+    it is saved or deleted (see user.signals), other fields are loaded
+    on access.
+    With settings.JWT_USER_FROM_CLAIMS the user is a ClaimsUser built
+    from the id, email and is_staff token claims alone, so changes to
+    a user only show once the client gets new tokens.
+    """
+
+    def get_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+        if settings.JWT_USER_FROM_CLAIMS:
+            return ClaimsUser(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        key = USER_CACHE_KEY.format(user_id)
+        fields = cache.get(key)
+        if fields is not None:
+            return self.cached_user(fields)
+        user = super().get_user(validated_token)
+        cache.set(
+            key, self.user_fields(user), settings.AUTH_USER_CACHE_TIMEOUT
+        )
+        return user
+
+    def user_fields(self, user):
+        return {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+
+    def cached_user(self, fields):
+        """The user of cached `fields`, the others deferred"""
+        # from_db() takes the values in the order of the model fields
+        names = [
+            field.attname
+            for field in self.user_model._meta.concrete_fields
+            if field.attname in fields
+        ]
+        return self.user_model.from_db(
+            None, names, [fields[name] for name in names]
+        )
+
+    async def aauthenticate(self, request):
+        """authenticate() with the cache and user lookups awaited"""
+        header = self.get_header(request)
+        if header is None:
+            return None
+
+        raw_token = self.get_raw_token(header)
+        if raw_token is None:
+            return None
+
+        validated_token = self.get_validated_token(raw_token)
+        return await self.aget_user(validated_token), validated_token
+
+    async def aget_user(self, validated_token):
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken(
+                _("Token contained no recognizable user identification")
+            )
+        if settings.JWT_USER_FROM_CLAIMS:
+            return ClaimsUser(validated_token)
+
+        user_id = validated_token[api_settings.USER_ID_CLAIM]
+        key = USER_CACHE_KEY.format(user_id)
+        fields = await cache.aget(key)
+        if fields is not None:
+            return self.cached_user(fields)
+        user = await self.user_model.objects.filter(
+            **{api_settings.USER_ID_FIELD: user_id}
+        ).afirst()
+        if user is None:
+            raise AuthenticationFailed(
+                _("User not found"), code="user_not_found"
+            )
+        if not user.is_active:
+            raise AuthenticationFailed(
+                _("User is inactive"), code="user_inactive"
+            )
+        await cache.aset(
+            key, self.user_fields(user), settings.AUTH_USER_CACHE_TIMEOUT
+        )
+        return user
+
+
+class CachedJWTScheme(SimpleJWTScheme):
+    target_class = "user.authentication.CachedJWTAuthentication"
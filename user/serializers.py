@@ -1,5 +1,10 @@
 from django.contrib.auth import get_user_model, authenticate
-from rest_framework import serializers
+from rest_framework import exceptions, serializers
+from rest_framework_simplejwt.serializers import (
+    TokenObtainPairSerializer,
+    TokenRefreshSerializer,
+)
+from rest_framework_simplejwt.settings import api_settings
 
 from django.utils.translation import gettext as _
 
@@ -66,3 +71,46 @@ class AuthTokenSerializer(serializers.Serializer):
 
         attrs['user'] = user
         return attrs
+
+
+def add_user_claims(token, user):
+    """The claims read by CachedJWTAuthentication"""
+    token["email"] = user.email
+    token["is_staff"] = user.is_staff
+    return token
+
+
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    """Token pair with the claims read by CachedJWTAuthentication"""
+
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+class ClaimsTokenRefreshSerializer(TokenRefreshSerializer):
+    """
+    Refresh with the claims of the user as it is now, so staff rights
+    do not outlive a demotion, and nothing for inactive users
+    """
+
+    default_error_messages = {
+        "no_active_account": _("No active account found with the given "
+                               "credentials")
+    }
+
+    def validate(self, attrs):
+        refresh = self.token_class(attrs["refresh"])
+        user = get_user_model().objects.filter(
+            **{api_settings.USER_ID_FIELD: refresh.get(
+                api_settings.USER_ID_CLAIM
+            )}
+        ).first()
+        if user is None or not api_settings.USER_AUTHENTICATION_RULE(user):
+            raise exceptions.AuthenticationFailed(
+                self.error_messages["no_active_account"],
+                "no_active_account",
+            )
+        # The new tokens, rotated or not, carry the claims set here
+        attrs["refresh"] = str(add_user_claims(refresh, user))
+        return super().validate(attrs)
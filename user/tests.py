@@ -1,3 +1,185 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken
+
+from book.tests.test_book_api import sample_book
+from borrowing.models import OutboxMessage
+from library_service.throttling import (
+    ScopedSlidingWindowThrottle,
+    SlidingWindows,
+)
+from user.authentication import USER_CACHE_KEY, CachedJWTAuthentication
+
+BOOK_URL = reverse("book:book-list")
+BORROWING_URL = reverse("borrowing:borrowing-list")
+ME_URL = reverse("user:manage")
+TOKEN_URL = reverse("user:token_obtain_pair")
+TOKEN_REFRESH_URL = reverse("user:token_refresh")
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class CachedJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = get_user_model().objects.create_user(
+            "user@user.com",
+            "user12345",
+        )
+        res = APIClient().post(
+            TOKEN_URL, {"email": "user@user.com", "password": "user12345"}
+        )
+        self.refresh = res.data["refresh"]
+        self.client = APIClient()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Bearer {res.data['access']}"
+        )
+
+    def test_user_cached_between_requests(self):
+        sample_book()
+        self.client.get(BOOK_URL)
+
+        with self.assertNumQueries(0):
+            res = self.client.get(BOOK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+
+    def test_only_public_user_fields_cached(self):
+        self.client.get(BOOK_URL)
+        fields = cache.get(USER_CACHE_KEY.format(self.user.id))
+        user = CachedJWTAuthentication().cached_user(fields)
+
+        self.assertEqual(
+            fields,
+            {
+                "id": self.user.id,
+                "email": "user@user.com",
+                "is_staff": False,
+                "is_active": True,
+            },
+        )
+        self.assertEqual(
+            (user.pk, user.email, user.is_staff),
+            (self.user.id, "user@user.com", False),
+        )
+
+    def test_saving_user_drops_cached_user(self):
+        self.client.get(BORROWING_URL)
+        self.user.is_staff = True
+        self.user.save()
+
+        res = self.client.delete(
+            reverse("borrowing:borrowing-detail", args=[1])
+        )
+
+        self.assertEqual(res.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_inactive_user_rejected(self):
+        self.user.is_active = False
+        self.user.save()
+
+        res = self.client.get(BOOK_URL)
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    @override_settings(JWT_USER_FROM_CLAIMS=True)
+    def test_user_from_token_claims(self):
+        sample_book()
+
+        res = self.client.post(
+            BORROWING_URL, {"book_id": 1, "expected_return_date": "2030-01-01"}
+        )
+        res_me = self.client.patch(ME_URL, {"password": "new12345"})
+
+        self.assertEqual(res.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(res.data["user_id"], self.user.id)
+        self.assertIn(
+            "email: user@user.com", OutboxMessage.objects.get().message
+        )
+        self.assertEqual(res_me.status_code, status.HTTP_200_OK)
+        self.assertEqual(res_me.data["email"], "user@user.com")
+        self.user.refresh_from_db()
+        self.assertTrue(self.user.check_password("new12345"))
+
+    def test_refresh_reissues_claims_of_current_user(self):
+        self.user.is_staff = True
+        self.user.save()
+        staff = APIClient().post(TOKEN_REFRESH_URL, {"refresh": self.refresh})
+        self.user.is_staff = False
+        self.user.save()
+
+        res = APIClient().post(
+            TOKEN_REFRESH_URL, {"refresh": staff.data["refresh"]}
+        )
+
+        self.assertTrue(AccessToken(staff.data["access"])["is_staff"])
+        self.assertEqual(res.status_code, status.HTTP_200_OK)
+        self.assertFalse(AccessToken(res.data["access"])["is_staff"])
+
+    def test_refresh_rejects_inactive_user(self):
+        self.user.is_active = False
+        self.user.save()
+
+        res = APIClient().post(TOKEN_REFRESH_URL, {"refresh": self.refresh})
+
+        self.assertEqual(res.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+@override_settings(DATABASE_REPLICAS=[])
+class SlidingWindowThrottleTests(TestCase):
+    def setUp(self):
+        cache.clear()
+
+    def test_sliding_window(self):
+        windows = SlidingWindows()
+
+        hits = [windows.hit("key", 2, 60, "test", now=t) for t in (0, 1, 2)]
+        # Second window, the previous one still weighs 2/3
+        hits += [windows.hit("key", 2, 60, "test", now=t) for t in (80, 81)]
+
+        self.assertEqual(
+            hits,
+            [(True, None), (True, None), (False, 58), (True, None),
+             (False, 9)],
+        )
+        self.assertEqual(
+            windows.stats()["scopes"]["test"], {"allowed": 3, "throttled": 2}
+        )
+
+    @override_settings(THROTTLE_REDIS_URL="redis://127.0.0.1:1/0")
+    def test_redis_unavailable_counts_locally(self):
+        windows = SlidingWindows()
+
+        with self.assertLogs("library_service.throttling", "ERROR"):
+            hits = [windows.hit("key", 1, 60, "test", now=t) for t in (0, 1)]
+
+        self.assertEqual(hits, [(True, None), (False, 59)])
+        self.assertEqual(windows.stats()["backend"], "redis")
+        self.assertEqual(windows.redis_errors, 2)
+
+    @mock.patch.object(
+        ScopedSlidingWindowThrottle,
+        "THROTTLE_RATES",
+        {"token": "2/minute"},
+    )
+    def test_token_scope_throttled(self):
+        admin = get_user_model().objects.create_user(
+            "admin@admin.com", "admin12345", is_staff=True
+        )
+        client = APIClient()
+        payload = {"email": "nobody@user.com", "password": "wrong12345"}
+
+        codes = [
+            client.post(TOKEN_URL, payload).status_code for _ in range(3)
+        ]
+        client.force_authenticate(admin)
+        stats = client.get(reverse("stats")).data["throttle"]
+
+        self.assertEqual(codes, [401, 401, 429])
+        self.assertEqual(stats["backend"], "local")
+        self.assertEqual(stats["scopes"]["token"]["throttled"], 1)
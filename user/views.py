@@ -1,7 +1,13 @@
+from django.contrib.auth import get_user_model
 from rest_framework import generics
 from rest_framework.authtoken.views import ObtainAuthToken
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.settings import api_settings
+from rest_framework_simplejwt.views import (
+    TokenObtainPairView,
+    TokenRefreshView,
+    TokenVerifyView,
+)
 
 from user.serializers import UserSerializer, AuthTokenSerializer
 
@@ -20,4 +26,17 @@ class ManageUserView(generics.RetrieveUpdateAPIView):
     permission_classes = (IsAuthenticated, )
 
     def get_object(self):
-        return self.request.user
+        # request.user may be a cached copy or built from token claims
+        return get_user_model().objects.get(pk=self.request.user.pk)
+
+
+class ScopedTokenObtainPairView(TokenObtainPairView):
+    throttle_scope = "token"
+
+
+class ScopedTokenRefreshView(TokenRefreshView):
+    throttle_scope = "token"
+
+
+class ScopedTokenVerifyView(TokenVerifyView):
+    throttle_scope = "token"